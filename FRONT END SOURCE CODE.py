@@ -1,29 +1,58 @@
-import pickle
 import streamlit as st
 from streamlit_option_menu import option_menu
 import base64
 import os
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
+import threading
+import time
+# Only light modules are imported up front. pandas, numpy, plotly and the
+# model (xgboost, sklearn) load when a page first needs them, or earlier in
+# the background warm-up started after the first render.
+from features import SERVING_THRESHOLD
+from metrics import observe, prometheus_text, start_prometheus_exporter, summary, timer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMG_DIR = os.path.join(BASE_DIR, "img")
+
+# Serve background images as static files instead of inlining them as base64,
+# e.g. DIASCAN_STATIC_URL="app/static/" with server.enableStaticServing = true
+# and the images copied into ./static
+STATIC_IMAGE_URL = os.environ.get("DIASCAN_STATIC_URL")
+
+# The admin metrics page is only listed when the URL carries ?admin=<token>
+ADMIN_TOKEN = os.environ.get("DIASCAN_ADMIN_TOKEN")
 
 # Get Base64 Background Image
 def get_base64_of_background_image(image_path):
     try:
         if os.path.exists(image_path):
-            with open(image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode()
-            return f"data:image/png;base64,{encoded_string}"
+            return _encode_image(image_path, os.path.getmtime(image_path))
     except Exception as e:
         st.warning(f"Background image not found: {image_path}")
     return None
 
+# Encoded images are cached per process (across reruns), keyed by path and mtime
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _encode_image(image_path, mtime):
+    with open(image_path, "rb") as image_file:
+        encoded_string = base64.b64encode(image_file.read()).decode()
+    return f"data:image/png;base64,{encoded_string}"
+
 # Set Page Configuration
 def set_page_config():
     st.set_page_config(page_title="diaScan - Your Health Partner", layout="wide")
 
 # CSS sytles
 def set_custom_css(background_image_path, show_background=True):
+    with timer("css"):
+        if show_background and os.path.exists(background_image_path):
+            css = _build_custom_css(background_image_path, os.path.getmtime(background_image_path), STATIC_IMAGE_URL)
+        else:
+            css = _build_custom_css(None, None, None)
+        st.markdown(css, unsafe_allow_html=True)
+
+# The assembled <style> block is built once per background image and mtime
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _build_custom_css(background_image_path, mtime, static_url):
     css = """
         <style>
         /*--Form--*/
@@ -179,20 +208,22 @@ def set_custom_css(background_image_path, show_background=True):
         
         """
     
-    if show_background:
-            with open(background_image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode()
+    if background_image_path:
+            if static_url:
+                image_url = static_url + os.path.basename(background_image_path)
+            else:
+                image_url = get_base64_of_background_image(background_image_path)
                 
             css += f"""
             [data-testid="stAppViewContainer"] {{
-                background-image: url("data:image/png;base64,{encoded_string}");
+                background-image: url("{image_url}");
                 background-size: cover;
                 background-position: center;
             }}
             """
     
     css += "</style>"
-    st.markdown(css, unsafe_allow_html=True)
+    return css
     
 
 # Home page
@@ -212,6 +243,7 @@ def home_page():
 # Prediction Page
 def predict_diabetes():
     st.title("Predict Diabetes Risk")
+    explained_record = None
     
     # Set a two colums for form
     with st.form("risk_assessment_form"):
@@ -225,7 +257,7 @@ def predict_diabetes():
         
         with col2:
             smoking_history = st.selectbox('Smoking History', 
-                ["Never", "Not Current", "Former", "Current"],
+                ["Never", "Not Current", "Former", "Current", "Ever", "No Info"],
                 index=None, placeholder="Select smoking history")
             bmi = st.number_input('Body Mass Index (BMI)', min_value=0.0, max_value=100.0, step=0.1)
             hba1c_level = st.number_input('HbA1c Level (%)', min_value=0.0, max_value=20.0, step=0.1)
@@ -237,36 +269,25 @@ def predict_diabetes():
             if not all([gender, smoking_history]) or not all(x > 0 for x in [age, bmi, hba1c_level, blood_glucose]):
                 st.error("Please fill in all fields before submitting.")
             else:
-                    # Convert inputs to match model (Convert categorical columns to numerical values)
-                    gender_map = {"Female": 0, "Male": 1, "Other": 2}
-                    smoking_map = {"Never": 0, "Current": 2, "Former": 3, "Not Current": 5}
-                    
-                    input_data = [
-                        gender_map[gender],
-                        age,
-                        1 if hypertension == "Yes" else 0,
-                        1 if heart_disease == "Yes" else 0,
-                        smoking_map[smoking_history],
-                        bmi,
-                        hba1c_level,
-                        blood_glucose
-                    ]
-                    
-                    # Load the model and StandardScaler
-                    model_path = r"C:\Users\nordi\OneDrive - Universiti Teknologi MARA\Documents\DEGREE SEM 6\CSP650\FRONT END\XGBoost-sav\diabetes_prediction_model.sav"
-                    scaler_path = r"C:\Users\nordi\OneDrive - Universiti Teknologi MARA\Documents\DEGREE SEM 6\CSP650\FRONT END\XGBoost-sav\diabetes_prediction_scaler.sav"
-                    
-                    diabetes_model = pickle.load(open(model_path, "rb"))
-                    scaler = pickle.load(open(scaler_path, "rb"))
-                    
-                    # Standardize the input data
-                    input_data_standardized = scaler.transform([input_data])
-                    
-                    # Make prediction
-                    diabetes_prediction = diabetes_model.predict(input_data_standardized)
+                    # Encoding, the cached model lookup and scoring live in inference.py
+                    record = {
+                        "gender": gender,
+                        "age": age,
+                        "hypertension": hypertension,
+                        "heart_disease": heart_disease,
+                        "smoking_history": smoking_history,
+                        "bmi": bmi,
+                        "HbA1c_level": hba1c_level,
+                        "blood_glucose_level": blood_glucose,
+                    }
+                    from inference import predict_one
+
+                    diabetes_probability = predict_one(record)
+                    explained_record = record
                     
-                    # Display results
-                    if diabetes_prediction[0] == 1:
+                    # Display results (the cut-off every serving entry point uses)
+                    render_start = time.perf_counter()
+                    if diabetes_probability >= SERVING_THRESHOLD:
                         st.markdown("""
                             <div style="background-color: #ffebee; padding: 20px; border-radius: 10px; margin-top: 20px;">
                                 <h2 style="color: #c62828;">Higher Risk Detected</h2>
@@ -321,54 +342,249 @@ def predict_diabetes():
                             </div>
 
                         """, unsafe_allow_html=True)
+                    observe("render", time.perf_counter() - render_start)
+    
+    # Outside the form, since widgets inside a form cannot trigger a rerun
+    if explained_record is not None:
+        explanation_panel(explained_record)
+        what_if_panel(explained_record)
+
+# Form fields as shown in the explanation chart
+FEATURE_LABELS = {
+    "gender": "Gender",
+    "age": "Age",
+    "hypertension": "Hypertension",
+    "heart_disease": "Heart Disease",
+    "smoking_history": "Smoking History",
+    "bmi": "BMI",
+    "HbA1c_level": "HbA1c Level",
+    "blood_glucose_level": "Blood Glucose",
+}
+
+# Only this fragment reruns when the panel is opened, so the result above
+# stays on screen, and the contributions are computed only once it is open
+@st.fragment
+def explanation_panel(record):
+    panel = st.expander("Why this result?", key="explanation_panel", on_change="rerun")
+    with panel:
+        if panel.open:
+            show_explanation(record)
+
+def show_explanation(record):
+    import plotly.graph_objects as go
+    from inference import explain_one
+
+    try:
+        contributions = explain_one(record)
+    except TypeError:
+        st.info("Explanations are not available for the compiled model.")
+        return
+    bias = contributions.pop("bias")
+    features = sorted(contributions, key=lambda name: abs(contributions[name]))
+    values = [contributions[name] for name in features]
+    fig = go.Figure(go.Bar(
+        x=values,
+        y=[f"{FEATURE_LABELS[name]} = {record[name]}" for name in features],
+        orientation="h",
+        marker_color=["#c62828" if value > 0 else "#2e7d32" for value in values],
+    ))
+    fig.update_layout(
+        height=320, margin=dict(l=10, r=10, t=10, b=10),
+        xaxis_title="Contribution to risk (log-odds)",
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(
+        f"Each bar shows how far an answer moved the risk estimate up (red) or down (green) "
+        f"from the model's baseline of {bias:+.2f} log-odds. This shows what the model relied on, "
+        f"not a medical diagnosis."
+    )
+
+# Lazy like the explanation panel; changing the chart options reruns only this fragment
+@st.fragment
+def what_if_panel(record):
+    panel = st.expander("What if my numbers change?", key="what_if_panel", on_change="rerun")
+    with panel:
+        if panel.open:
+            with timer("what_if"):
+                show_what_if(record)
+
+WHAT_IF_PAIRS = {
+    "BMI and HbA1c Level": ("bmi", "HbA1c_level"),
+    "BMI and Blood Glucose": ("bmi", "blood_glucose_level"),
+    "HbA1c Level and Blood Glucose": ("HbA1c_level", "blood_glucose_level"),
+}
+
+def show_what_if(record):
+    import plotly.graph_objects as go
+    from what_if import SWEEP_RANGES, what_if
+
+    # One risk curve per feature, everything else held at the submitted values.
+    # Figures are built in one go (data + layout): plotly's incremental
+    # update_layout/add_hline calls cost several times more.
+    columns = st.columns(len(SWEEP_RANGES))
+    for col, feature in zip(columns, SWEEP_RANGES):
+        x_values, _, probabilities = what_if(record, feature)
+        fig = go.Figure(
+            data=[
+                go.Scatter(x=x_values, y=probabilities, mode="lines", line_color="#4da6ff"),
+                go.Scatter(
+                    x=[record[feature]], y=[predict_curve_point(x_values, probabilities, record[feature])],
+                    mode="markers", marker=dict(color="#c62828", size=10), name="You",
+                ),
+            ],
+            layout=dict(
+                height=260, margin=dict(l=10, r=10, t=30, b=10), showlegend=False,
+                title=FEATURE_LABELS[feature], yaxis=dict(title="Risk", range=[0, 1]),
+                # Cut-off used for the result above
+                shapes=[dict(type="line", xref="paper", x0=0, x1=1, y0=SERVING_THRESHOLD, y1=SERVING_THRESHOLD,
+                             line=dict(dash="dot", color="gray"))],
+            ),
+        )
+        with col:
+            st.plotly_chart(fig, use_container_width=True, key=f"what_if_{feature}")
+
+    pair = st.selectbox("Change two values together", list(WHAT_IF_PAIRS), key="what_if_pair")
+    x_feature, y_feature = WHAT_IF_PAIRS[pair]
+    x_values, y_values, probabilities = what_if(record, x_feature, y_feature)
+    fig = go.Figure(
+        data=[
+            go.Heatmap(
+                x=x_values, y=y_values, z=probabilities, zmin=0, zmax=1,
+                colorscale=[[0, "#2e7d32"], [0.5, "#fff59d"], [1, "#c62828"]], colorbar=dict(title="Risk"),
+            ),
+            go.Scatter(
+                x=[record[x_feature]], y=[record[y_feature]], mode="markers",
+                marker=dict(color="black", size=10, symbol="x"), name="You",
+            ),
+        ],
+        layout=dict(
+            height=420, margin=dict(l=10, r=10, t=10, b=10), showlegend=False,
+            xaxis_title=FEATURE_LABELS[x_feature], yaxis_title=FEATURE_LABELS[y_feature],
+        ),
+    )
+    st.plotly_chart(fig, use_container_width=True, key="what_if_heatmap")
+    st.caption("Estimated risk if only these values changed. The model's estimate, not medical advice.")
+
+# Risk at the submitted value, read off the curve
+def predict_curve_point(x_values, probabilities, value):
+    index = min(range(len(x_values)), key=lambda i: abs(x_values[i] - value))
+    return float(probabilities[index])
+
+# Hidden admin page: per-stage latency percentiles for this server process
+def admin_page():
+    st.title("Request Metrics")
+    stages = summary()
+    if not stages:
+        st.info("No requests timed yet.")
+        return
+    st.table([
+        {
+            "Stage": stage,
+            "Count": row["count"],
+            "Mean (ms)": f"{row['mean_ms']:.3f}",
+            "p50 (ms)": f"{row['p50_ms']:.3f}",
+            "p95 (ms)": f"{row['p95_ms']:.3f}",
+            "p99 (ms)": f"{row['p99_ms']:.3f}",
+        }
+        for stage, row in stages.items()
+    ])
+    text = prometheus_text()
+    st.download_button("Download Prometheus metrics", text, file_name="diascan_metrics.prom", mime="text/plain")
+    with st.expander("Prometheus text format"):
+        st.code(text, language="text")
+    cache_stats_table()
+    shadow_stats_table()
+    drift_report_table()
+
+# Hit/miss/eviction counters of this process's prediction cache
+def cache_stats_table():
+    from prediction_cache import get_prediction_cache
+
+    st.subheader("Prediction Cache")
+    stats = get_prediction_cache().stats()
+    st.table([{
+        "Hits": stats["hits"],
+        "Misses": stats["misses"],
+        "Hit rate": f"{stats['hit_rate']:.1%}",
+        "Evictions": stats["evictions"],
+        "Entries": stats["size"],
+    }])
+
+# Agreement and latency of the shadow model, when one is configured (see shadow.py)
+def shadow_stats_table():
+    from shadow import get_shadow_evaluator
+
+    st.subheader("Shadow Model")
+    evaluator = get_shadow_evaluator()
+    if evaluator is None:
+        st.info("No shadow model configured; set DIASCAN_SHADOW_MODEL to compare a candidate model.")
+        return
+    stats = evaluator.stats()
+    if not stats["compared"]:
+        st.info(f"No requests compared yet ({stats['dropped']} dropped).")
+        return
+    st.table([{
+        "Compared": stats["compared"],
+        "Dropped": stats["dropped"],
+        "Agreement": f"{stats['agreement_rate']:.1%}",
+        "Mean |Δp|": f"{stats['mean_abs_diff']:.4f}",
+        "Latency Δ (ms)": f"{stats['mean_latency_delta_ms']:+.3f}",
+    }])
+
+# Last input-drift window scored by this process (see drift.py)
+def drift_report_table():
+    from drift import get_drift_monitor
+
+    st.subheader("Input Drift")
+    monitor = get_drift_monitor()
+    if monitor is None:
+        st.info("No drift reference found; run train_pipeline.py or `python drift.py --build-reference`.")
+        return
+    if monitor.last_report is None:
+        st.info(f"No drift window scored yet (one is scored every {monitor.window:.0f} s "
+                f"once it has {monitor.min_count} requests).")
+        return
+    st.caption("Window ending " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(monitor.last_report["timestamp"])))
+    st.table([
+        {
+            "Feature": FEATURE_LABELS.get(column, column),
+            "Requests": row["count"],
+            "PSI": f"{row['psi']:.3f}",
+            "KS": f"{row['ks']:.3f}" if "ks" in row else "-",
+            "Drifted": "Yes" if row["drifted"] else "",
+        }
+        for column, row in monitor.last_report["features"].items()
+    ])
 
 # Malaysia Statistic Dashboard
 def create_malaysia_dashboard():
+    from dashboard_figures import get_figure, load_statistics
+    
+    # Statistics come from data/malaysia_statistics.json; figures are built once and cached
+    stats = load_statistics()
         
     # Create four columns for all elements
     col_total, col_type1, col_type2, col_others = st.columns([1, 1, 1, 1])
     
     # Total patients box
     with col_total:
-        st.markdown("""
+        st.markdown(f"""
             <div class="custom-box">
-                <h1 style="text-align: center; margin: 0; font-size: 2.5rem;">1,956,151</h1>
+                <h1 style="text-align: center; margin: 0; font-size: 2.5rem;">{stats["total_patients"]:,}</h1>
                 <p style="text-align: center; margin: 0; color: #666;">total diabetes patients in Malaysia</p>
             </div>
         """, unsafe_allow_html=True)
     
-    # Diabetes Types data
-    diabetes_types = [
-        ("Type 1 Diabetes\nMellitus", 0.47),
-        ("Type 2 Diabetes\nMellitus", 99.48),
-        ("Others", 0.05)
-    ]
-    
     # Create donut charts for each type
-    for col, (diabetes_type, percentage) in zip([col_type1, col_type2, col_others], diabetes_types):
+    for i, (col, item) in enumerate(zip([col_type1, col_type2, col_others], stats["diabetes_types"])):
         with col:
             st.markdown(f"""
                 <div class="custom-box">
-                    <p style="text-align: center; margin-bottom: 10px; font-size: 0.9rem;">{diabetes_type}</p>
+                    <p style="text-align: center; margin-bottom: 10px; font-size: 0.9rem;">{item["label"]}</p>
                 </div>
             """, unsafe_allow_html=True)
             
-            fig = go.Figure(data=[go.Pie(
-                labels=['', diabetes_type],
-                values=[100-percentage, percentage],
-                hole=.7,
-                marker_colors=['#E8E8E8', '#1f77b4'] if 'Type 2' in diabetes_type else ['#E8E8E8', '#89CFF0']
-            )])
-            
-            fig.update_layout(
-                annotations=[dict(text=f'{percentage}%', x=0.5, y=0.5, font_size=20, showarrow=False)],
-                showlegend=False,
-                height=200,
-                margin=dict(l=0, r=0, t=30, b=30),
-                paper_bgcolor='white'
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(get_figure(f"type_{i}"), use_container_width=True)
 
     # Add some vertical spacing before the next row
     st.markdown("<br>", unsafe_allow_html=True)
@@ -383,24 +599,7 @@ def create_malaysia_dashboard():
                 <p style="text-align: center; margin-bottom: 10px; font-size: 1rem;">Gender Distribution</p>
             </div>
         """, unsafe_allow_html=True)
-        gender_data = pd.DataFrame({
-            'Gender': ['Men', 'Women'],
-            'Percentage': [42.92, 57.08]
-        })
-        
-        fig_gender = px.pie(
-            gender_data,
-            values='Percentage',
-            names='Gender',
-            color_discrete_sequence=['#86eae9', '#3b6696']
-        )
-        fig_gender.update_traces(textposition='inside', textinfo='percent+label')
-        fig_gender.update_layout(
-            paper_bgcolor='white',
-            margin=dict(l=0, r=0, t=30, b=30),
-            height=300
-        )
-        st.plotly_chart(fig_gender, use_container_width=True)
+        st.plotly_chart(get_figure("gender"), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Ethnic Distribution
@@ -410,28 +609,7 @@ def create_malaysia_dashboard():
                 <p style="text-align: center; margin-bottom: 10px; font-size: 1rem;">Ethnicity Distribution</p>
             </div>
         """, unsafe_allow_html=True)
-        ethnic_data = pd.DataFrame({
-            'Ethnicity': ['Malay', 'Chinese', 'Indian', 'Others'],
-            'Percentage': [60.13, 19.27, 12.58, 8.02]
-        })
-        
-        fig_ethnic = px.bar(
-        ethnic_data,
-        x='Ethnicity',
-        y='Percentage',
-        color='Ethnicity', 
-        color_discrete_sequence=['#00589c', '#19aade', '#1ac9e6', '#6dfdd2']
-        )
-        fig_ethnic.update_layout(
-            xaxis_title="Ethnicity",
-            yaxis_title="Percentage (%)",
-            showlegend=False,
-            paper_bgcolor='white',
-            plot_bgcolor='white',
-            margin=dict(l=10, r=10, t=30, b=30),
-            height=300
-        )
-        st.plotly_chart(fig_ethnic, use_container_width=True)
+        st.plotly_chart(get_figure("ethnicity"), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
         
@@ -581,12 +759,114 @@ def educational_page():
     st.markdown("<h1 class='main-title'>Malaysian Diabetes Statistics in 2023</h1>", unsafe_allow_html=True)
     create_malaysia_dashboard()
 
+EXPLORER_LABELS = {
+    "gender": "Gender",
+    "age_band": "Age Band",
+    "bmi_bucket": "BMI Category",
+    "hba1c_band": "HbA1c Level",
+    "smoking_history": "Smoking History",
+}
+
+# Dataset Explorer: diabetes rate in the training data, sliced from the
+# pre-aggregated cubes (data/dataset_cubes.npz, built by cubes.py), so no
+# request reads the CSV
+def dataset_explorer_page():
+    import plotly.graph_objects as go
+    from cubes import get_cubes
+
+    st.markdown("<h1 class='main-title'>Dataset Explorer</h1>", unsafe_allow_html=True)
+    cube = get_cubes()
+    if cube is None:
+        st.info("The dataset cubes have not been built yet. Run `python cubes.py` first.")
+        return
+
+    col_group, col_split = st.columns(2)
+    with col_group:
+        group = st.selectbox("Diabetes rate by", cube.dimensions, format_func=EXPLORER_LABELS.get,
+                             key="explorer_group")
+    with col_split:
+        split = st.selectbox("Split by", [None] + [d for d in cube.dimensions if d != group],
+                             format_func=lambda d: "None" if d is None else EXPLORER_LABELS[d], key="explorer_split")
+    filters = {}
+    with st.expander("Filters"):
+        for dimension in cube.dimensions:
+            labels = cube.labels(dimension)
+            chosen = st.multiselect(EXPLORER_LABELS[dimension], labels, default=labels,
+                                    key=f"explorer_filter_{dimension}")
+            if len(chosen) < len(labels):
+                filters[dimension] = [label for label in labels if label in chosen]
+
+    with timer("explorer_aggregate"):
+        frame = cube.aggregate([group] + ([split] if split else []), filters)
+    total = int(frame["rows"].sum())
+    if not total:
+        st.warning("No records match these filters.")
+        return
+
+    if split:
+        bars = [
+            go.Bar(x=part[group], y=part["rate"] * 100, name=str(label), customdata=part["rows"],
+                   hovertemplate="%{x}: %{y:.1f}% of %{customdata:,} records")
+            for label, part in frame.groupby(split, sort=False)
+        ]
+    else:
+        bars = [go.Bar(x=frame[group], y=frame["rate"] * 100, customdata=frame["rows"], marker_color="#4da6ff",
+                       hovertemplate="%{x}: %{y:.1f}% of %{customdata:,} records<extra></extra>")]
+    fig = go.Figure(
+        data=bars,
+        layout=dict(
+            barmode="group", height=420, margin=dict(l=10, r=10, t=10, b=10),
+            xaxis_title=EXPLORER_LABELS[group], yaxis_title="Diabetes rate (%)",
+            legend_title_text=EXPLORER_LABELS[split] if split else None,
+        ),
+    )
+    st.plotly_chart(fig, use_container_width=True, key="explorer_chart")
+
+    table = frame.rename(columns={
+        group: EXPLORER_LABELS[group], split: EXPLORER_LABELS.get(split),
+        "rows": "Records", "diabetes": "With Diabetes", "rate": "Rate (%)",
+    })
+    table["Rate (%)"] = (table["Rate (%)"] * 100).round(1)
+    st.dataframe(table, hide_index=True, use_container_width=True)
+    dedupe_note = ", duplicates removed" if cube.meta["deduplicated"] else ""
+    st.caption(f"{total:,} matching records from {cube.meta['source']}{dedupe_note}.")
+
     
+# Load the model and build the dashboard figures once per process, off the
+# script thread, so the first prediction does not pay for unpickling
+def _warm_up():
+    from dashboard_figures import get_dashboard_figures
+    from inference import encode_one
+    from model_registry import get_registry
+
+    with timer("warm_up"):
+        # Score one row directly, bypassing the prediction cache and shadow model,
+        # and timed apart from the serving stages (a cold call would skew them)
+        get_registry().get().with_stage_prefix("warm_up_").predict_proba(encode_one({
+            "gender": "Female", "age": 50, "hypertension": 0, "heart_disease": 0,
+            "smoking_history": "never", "bmi": 25.0, "HbA1c_level": 5.5, "blood_glucose_level": 100,
+        }))
+        get_dashboard_figures()
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    thread = threading.Thread(target=_warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
 def main():
+    with timer("rerun"):
+        run_page()
+    # The page is already rendered by now
+    start_warm_up()
+    # No-op unless DIASCAN_METRICS_PATH is set (node_exporter textfile collector)
+    start_prometheus_exporter()
+
+def run_page():
     
     # Background image for home page
-    background_image_path = r"C:\Users\nordi\OneDrive - Universiti Teknologi MARA\Documents\DEGREE SEM 6\CSP650\USER INTERFACE\1.3.png"
-    risk_assessment_background_path = r"C:\Users\nordi\OneDrive - Universiti Teknologi MARA\Documents\DEGREE SEM 6\CSP650\USER INTERFACE\risk_assessment(3).png"
+    background_image_path = os.path.join(IMG_DIR, "1.3.png")
+    risk_assessment_background_path = os.path.join(IMG_DIR, "risk_assessment(3).png")
 
     set_page_config()
     
@@ -600,10 +880,13 @@ def main():
         set_custom_css(risk_assessment_background_path, show_background=True)
         
         # Navigation Bar
+        menu_options = ['Predict Diabetes Risk', 'Educational Support', 'Dataset Explorer', 'Back to Home']
+        if ADMIN_TOKEN and st.query_params.get("admin") == ADMIN_TOKEN:
+            menu_options.insert(3, 'Admin Metrics')
         with st.sidebar:
             selected = option_menu(
                 'Welcome to diaScan - Your Health Partner',
-                ['Predict Diabetes Risk', 'Educational Support', 'Back to Home'],
+                menu_options,
                 icons=['clipboard-data', 'house'],
                 menu_icon="list",
                 default_index=0,
@@ -622,6 +905,10 @@ def main():
             predict_diabetes()
         elif selected == 'Educational Support':
             educational_page()
+        elif selected == 'Dataset Explorer':
+            dataset_explorer_page()
+        elif selected == 'Admin Metrics':
+            admin_page()
         elif selected == 'Back to Home':
             st.session_state.page = 'home'
             st.rerun()
@@ -0,0 +1,318 @@
+import argparse
+import atexit
+import datetime
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from model_registry import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+AUDIT_DIR = os.path.join(BASE_DIR, "audit_log")
+
+# The writer flushes when this many seconds have passed since the first
+# queued record, or when this many rows are waiting, whichever is first
+FLUSH_INTERVAL = 10.0
+MAX_BATCH_ROWS = 50_000
+# Queued items (requests) before record() blocks the caller
+MAX_QUEUE = 100_000
+
+COMPACTED_PREFIX = "compacted-"
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("model_version", pa.string()),
+            ("source", pa.string()),
+            ("probability", pa.float64()),
+        ]
+        + [(column, pa.float64()) for column in FEATURE_COLUMNS]
+    )
+
+
+# Directory of one UTC day, hive-style so queries can skip whole days
+def _day_dir(directory, day):
+    return os.path.join(directory, f"date={day}")
+
+
+# Write `table` to `path` atomically: readers never see a partial segment
+def _write_segment(table, path):
+    import pyarrow.parquet as pq
+
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# Append-only prediction audit log. record() only queues; a background
+# thread turns queued records into immutable Parquet segments under
+# <directory>/date=YYYY-MM-DD/, one per flush. The queue is bounded, so a
+# writer that cannot keep up slows callers down instead of losing records.
+class AuditLog:
+    def __init__(self, directory=AUDIT_DIR, flush_interval=FLUSH_INTERVAL, max_batch_rows=MAX_BATCH_ROWS,
+                 max_queue=MAX_QUEUE):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_batch_rows = max_batch_rows
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._sequence = itertools.count()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # Queue one prediction (a feature row) or a batch (2-D rows with a
+    # probability per row) for the audit log
+    def record(self, features, probabilities, model_version, source="ui", timestamp=None):
+        rows = np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+        probabilities = np.asarray(probabilities, dtype=np.float64).reshape(-1)
+        self._queue.put((timestamp or time.time(), rows, probabilities, model_version, source))
+
+    # Flush everything queued so far and stop the writer
+    def close(self):
+        if not self._closed.is_set():
+            self._closed.set()
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            rows = len(item[1])
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while rows < self.max_batch_rows:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                rows += len(item[1])
+            try:
+                self._flush(batch)
+            except Exception:
+                logger.exception("Failed to write %d audit records", rows)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        import pyarrow as pa
+
+        counts = [len(rows) for _, rows, _, _, _ in batch]
+        timestamps = np.repeat(
+            np.array([int(ts * 1_000_000) for ts, _, _, _, _ in batch], dtype=np.int64), counts,
+        ).astype("datetime64[us]")
+        features = np.vstack([rows for _, rows, _, _, _ in batch])
+        columns = {
+            "timestamp": pa.array(timestamps, type=pa.timestamp("us", tz="UTC")),
+            "model_version": pa.array(np.repeat([version for _, _, _, version, _ in batch], counts)),
+            "source": pa.array(np.repeat([source for _, _, _, _, source in batch], counts)),
+            "probability": np.concatenate([probabilities for _, _, probabilities, _, _ in batch]),
+        }
+        for i, column in enumerate(FEATURE_COLUMNS):
+            columns[column] = features[:, i]
+        table = pa.table(columns, schema=_schema())
+
+        # A batch can straddle midnight (UTC): one segment per day
+        days = timestamps.astype("datetime64[D]")
+        for day in np.unique(days):
+            mask = days == day
+            day_dir = _day_dir(self.directory, str(day))
+            os.makedirs(day_dir, exist_ok=True)
+            name = f"segment-{int(time.time() * 1000)}-{os.getpid()}-{next(self._sequence):06d}.parquet"
+            _write_segment(table.filter(pa.array(mask)) if not mask.all() else table, os.path.join(day_dir, name))
+
+
+_audit_log = None
+_audit_lock = threading.Lock()
+
+
+# Process-wide audit log, writing to DIASCAN_AUDIT_DIR (default ./audit_log).
+# Set DIASCAN_AUDIT_DIR to an empty string to turn auditing off. Returns
+# None when auditing is off or pyarrow is not installed.
+def get_audit_log():
+    global _audit_log
+    directory = os.environ.get("DIASCAN_AUDIT_DIR", AUDIT_DIR)
+    if not directory:
+        return None
+    if _audit_log is None:
+        with _audit_lock:
+            if _audit_log is None:
+                try:
+                    import pyarrow  # noqa: F401
+                except ImportError:
+                    logger.error("pyarrow is not installed; predictions are NOT being audited")
+                    return None
+                _audit_log = AuditLog(directory)
+    return _audit_log
+
+
+# Flush and stop the process-wide audit log, if one was started (for exits
+# that skip atexit, such as os._exit in forked workers)
+def close_audit_log():
+    if _audit_log is not None:
+        _audit_log.close()
+
+
+# Directory the readers default to: DIASCAN_AUDIT_DIR, as for the writer in
+# get_audit_log, falling back to ./audit_log when it is unset or empty
+def audit_dir():
+    return os.environ.get("DIASCAN_AUDIT_DIR") or AUDIT_DIR
+
+
+def _to_timestamp(value):
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+# Stream audit records with start <= timestamp < end (datetimes, dates or
+# ISO strings; naive values are UTC) as pyarrow RecordBatches. Only the
+# day directories in range are opened, row groups outside the range are
+# skipped from their statistics, and only `columns` are read, so memory
+# stays at one batch however many months are scanned.
+def iter_records(start, end, model_version=None, columns=None, directory=None):
+    import pyarrow.dataset as ds
+
+    directory = directory or audit_dir()
+    start, end = _to_timestamp(start), _to_timestamp(end)
+    first_day, last_day = start.date().isoformat(), end.date().isoformat()
+    if not os.path.isdir(directory):
+        return
+    files = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("date=") and first_day <= name[5:] <= last_day:
+            day_dir = os.path.join(directory, name)
+            files.extend(os.path.join(day_dir, f) for f in sorted(os.listdir(day_dir)) if f.endswith(".parquet"))
+    if not files:
+        return
+
+    dataset = ds.dataset(files, schema=_schema(), format="parquet")
+    condition = (ds.field("timestamp") >= start) & (ds.field("timestamp") < end)
+    if model_version is not None:
+        condition &= ds.field("model_version") == model_version
+    yield from dataset.to_batches(columns=columns, filter=condition)
+
+
+# Matching audit records as one DataFrame (for ranges that fit in memory)
+def query(start, end, model_version=None, columns=None, directory=None):
+    import pyarrow as pa
+
+    batches = list(iter_records(start, end, model_version, columns, directory))
+    if not batches:
+        return _schema().empty_table().select(columns or _schema().names).to_pandas()
+    return pa.Table.from_batches(batches).to_pandas()
+
+
+# Merge the segments of one finished day into a single file. The merged
+# file names its sources in its metadata, so leftovers from an interrupted
+# compaction are removed on the next run instead of being counted twice.
+def compact_day(day, directory=None):
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    directory = directory or audit_dir()
+    day = _to_timestamp(day).date().isoformat()
+    if day >= datetime.datetime.now(datetime.timezone.utc).date().isoformat():
+        raise ValueError(f"Only finished days can be compacted, not {day}")
+    day_dir = _day_dir(directory, day)
+    names = sorted(os.listdir(day_dir))
+
+    for name in names:
+        if name.startswith(COMPACTED_PREFIX) and name.endswith(".parquet"):
+            metadata = pq.read_schema(os.path.join(day_dir, name)).metadata or {}
+            for source in metadata.get(b"sources", b"").decode().split(","):
+                if source and os.path.exists(os.path.join(day_dir, source)):
+                    os.remove(os.path.join(day_dir, source))
+    names = sorted(n for n in os.listdir(day_dir) if n.endswith(".parquet"))
+    if len(names) <= 1:
+        return 0
+
+    schema = _schema().with_metadata({"sources": ",".join(names)})
+    output = os.path.join(day_dir, f"{COMPACTED_PREFIX}{int(time.time() * 1000)}.parquet")
+    rows = 0
+    with pq.ParquetWriter(output + ".tmp", schema, compression="zstd") as writer:
+        dataset = ds.dataset([os.path.join(day_dir, name) for name in names], schema=_schema(), format="parquet")
+        for batch in dataset.to_batches():
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    os.replace(output + ".tmp", output)
+    for name in names:
+        os.remove(os.path.join(day_dir, name))
+    return rows
+
+
+# Compact every day directory before `before` (default: today, UTC)
+def compact(before=None, directory=None):
+    directory = directory or audit_dir()
+    before = _to_timestamp(before or datetime.datetime.now(datetime.timezone.utc)).date().isoformat()
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("date=") and name[5:] < before:
+            rows = compact_day(name[5:], directory)
+            if rows:
+                print(f"{name[5:]}: {rows} records compacted")
+
+
+# Records per day and model version, computed batch by batch
+def summarize(start, end, model_version=None, directory=None):
+    counts = {}
+    for batch in iter_records(start, end, model_version, ["timestamp", "model_version"], directory):
+        days = batch.column("timestamp").to_numpy().astype("datetime64[D]").astype(str)
+        versions = batch.column("model_version").to_numpy(zero_copy_only=False)
+        keys, numbers = np.unique(np.char.add(np.char.add(days, " "), versions.astype(str)), return_counts=True)
+        for key, number in zip(keys.tolist(), numbers.tolist()):
+            counts[key] = counts.get(key, 0) + number
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or compact the prediction audit log.")
+    parser.add_argument("--dir", default=None, help="audit log directory (default: DIASCAN_AUDIT_DIR or ./audit_log)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    query_parser = commands.add_parser("query", help="export or count records in a date range")
+    query_parser.add_argument("--start", required=True, help="ISO date/time (UTC), inclusive")
+    query_parser.add_argument("--end", required=True, help="ISO date/time (UTC), exclusive")
+    query_parser.add_argument("--model-version")
+    query_parser.add_argument("--output", help="write matching records to this CSV instead of counting")
+    compact_parser = commands.add_parser("compact", help="merge the segments of finished days")
+    compact_parser.add_argument("--before", help="compact days before this date (default: today, UTC)")
+    args = parser.parse_args(argv)
+
+    if args.command == "compact":
+        compact(args.before, args.dir)
+        return
+    if args.output:
+        first = True
+        for batch in iter_records(args.start, args.end, args.model_version, directory=args.dir):
+            batch.to_pandas().to_csv(args.output, mode="w" if first else "a", header=first, index=False)
+            first = False
+        return
+    for key, number in sorted(summarize(args.start, args.end, args.model_version, args.dir).items()):
+        print(f"{key}: {number}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from audit import get_audit_log
+from features import FEATURE_COLUMNS, SERVING_THRESHOLD
+from inference import encode_many
+from model_registry import get_registry
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+# Each worker process loads the model once and scores single-threaded,
+# so parallelism comes from the pool instead of XGBoost's own threads
+# (exported and fused tree models are single-threaded already)
+def _init_worker():
+    model = get_registry().get().model
+    if hasattr(model, "get_booster"):
+        model.get_booster().set_param({"nthread": 1})
+
+
+# (probabilities, contributions or None, model version). With
+# contributions the probability is taken from their sum (the margin), so
+# each chunk still costs one pass over the trees.
+def _score_chunk(features, contribs=None):
+    bundle = get_registry().get()
+    if contribs is None:
+        return bundle.predict_proba(features), None, bundle.version
+    contributions = bundle.contributions(features, approximate=contribs == "approx")
+    probabilities = 1.0 / (1.0 + np.exp(-contributions.sum(axis=1, dtype=np.float64)))
+    return probabilities, contributions, bundle.version
+
+
+# Read the CSV in fixed-size chunks and yield (chunk, encoded features).
+# Invalid values are scored as missing rather than failing the whole file.
+def _iter_chunks(input_path, chunksize):
+    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+        yield chunk, encode_many(chunk, errors="coerce")
+
+
+# Append a scored chunk to the output CSV and queue it for the audit log,
+# like every other prediction path
+def _write_chunk(chunk, features, scores, output_path, threshold, first):
+    probabilities, contributions, version = scores
+    audit_log = get_audit_log()
+    if audit_log is not None:
+        audit_log.record(features, probabilities, version, source="batch")
+    chunk["diabetes_probability"] = probabilities
+    chunk["diabetes_prediction"] = (probabilities >= threshold).astype("int8")
+    chunk["model_version"] = version
+    if contributions is not None:
+        for i, column in enumerate(FEATURE_COLUMNS + ["bias"]):
+            chunk[f"contrib_{column}"] = contributions[:, i]
+    chunk.to_csv(output_path, mode="w" if first else "a", header=first, index=False)
+
+
+# Score input_path into output_path. At most `workers * 2` chunks are in
+# flight at once, so memory stays flat regardless of the file size.
+# contribs="approx" or "exact" adds contrib_<feature> columns (log-odds).
+def score_csv(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, workers=None, threshold=SERVING_THRESHOLD,
+              contribs=None):
+    workers = workers or os.cpu_count() or 1
+    total_rows = 0
+    first = True
+    start = time.perf_counter()
+
+    if workers == 1:
+        for chunk, features in _iter_chunks(input_path, chunksize):
+            _write_chunk(chunk, features, _score_chunk(features, contribs), output_path, threshold, first)
+            first = False
+            total_rows += len(chunk)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = deque()
+            for chunk, features in _iter_chunks(input_path, chunksize):
+                pending.append((chunk, features, pool.submit(_score_chunk, features, contribs)))
+                if len(pending) >= workers * 2:
+                    done_chunk, done_features, future = pending.popleft()
+                    _write_chunk(done_chunk, done_features, future.result(), output_path, threshold, first)
+                    first = False
+                    total_rows += len(done_chunk)
+            while pending:
+                done_chunk, done_features, future = pending.popleft()
+                _write_chunk(done_chunk, done_features, future.result(), output_path, threshold, first)
+                first = False
+                total_rows += len(done_chunk)
+
+    elapsed = time.perf_counter() - start
+    return total_rows, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a diabetes screening CSV with the saved model.")
+    parser.add_argument("input", help="CSV with the same columns as diabetes_prediction_dataset.csv")
+    parser.add_argument("output", help="CSV to write, with diabetes_probability, diabetes_prediction and "
+                                       "model_version added")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--threshold", type=float, default=SERVING_THRESHOLD, help="decision threshold")
+    parser.add_argument("--contribs", choices=["approx", "exact"],
+                        help="add per-feature contributions: 'approx' (fast path approximation) "
+                             "or 'exact' (TreeSHAP, far slower)")
+    args = parser.parse_args(argv)
+
+    rows, elapsed = score_csv(args.input, args.output, args.chunksize, args.workers, args.threshold,
+                              args.contribs)
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Scored {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+
+import numpy as np
+
+import train_pipeline
+from model_registry import BASE_DIR
+
+RESULTS_PATH = os.path.join(BASE_DIR, "benchmark_results.json")
+BASELINE_PATH = os.path.join(BASE_DIR, "benchmark_baseline.json")
+
+# A benchmark regresses when its median time grows by more than this fraction
+DEFAULT_TOLERANCE = 0.20
+BATCH_SIZES = (1, 100, 10_000, 1_000_000)
+# One row of the prediction form, already encoded (Male, never smoked)
+SAMPLE_ROW = [1, 50, 0, 0, 0, 27.32, 6.1, 140]
+
+
+# Pipeline stage outputs shared between benchmarks, computed on first use
+# with the same functions and config the training pipeline runs
+class _Stages:
+    def __init__(self, config):
+        self.config = config
+        self._outputs = {}
+
+    def __getitem__(self, stage):
+        if stage not in self._outputs:
+            self._outputs[stage] = self.run(stage)()
+        return self._outputs[stage]
+
+    # Zero-argument callable that runs one stage on its (computed) inputs
+    def run(self, stage):
+        _, fn, _, inputs = next(s for s in train_pipeline.STAGES if s[0] == stage)
+        inputs = {key: self[src][out] for key, (src, out) in inputs.items()}
+        return lambda: fn(inputs, self.config)
+
+
+def _load_and_encode(stages):
+    config = stages.config
+
+    def run():
+        data = train_pipeline.load({}, config)["data"]
+        return train_pipeline.encode({"data": data}, config)
+
+    return run
+
+
+def _predict_single(stages):
+    from model_registry import get_registry
+
+    # The uncached part of predict_diabetes(): registry lookup, scale, predict
+    row = list(SAMPLE_ROW)
+    return lambda: get_registry().get().predict_proba(row)
+
+
+def _predict_batch(size):
+    def setup(stages):
+        from model_registry import get_registry
+
+        X = stages["encode"]["X"]
+        rows = np.resize(X, (size, X.shape[1])) if size > len(X) else X[:size].copy()
+        bundle = get_registry().get()
+        return lambda: bundle.predict_proba(rows)
+
+    return setup
+
+
+# (name, setup(stages) -> zero-argument callable, repeats)
+BENCHMARKS = [
+    ("load_encode", _load_and_encode, 5),
+    ("dedupe", lambda stages: stages.run("dedupe"), 5),
+    ("scale", lambda stages: stages.run("scale"), 5),
+    ("split", lambda stages: stages.run("split"), 5),
+    ("smote", lambda stages: stages.run("resample"), 3),
+    ("xgb_fit", lambda stages: stages.run("fit"), 3),
+    ("predict_single", _predict_single, 5),
+] + [(f"predict_proba_{size}", _predict_batch(size), 5) for size in BATCH_SIZES]
+
+
+# Seconds per call: like timeit, fast calls are looped until one
+# measurement takes at least 0.2 s, and the median of the repeats is kept
+def measure(fn, repeats):
+    fn()  # warm-up
+    number, _ = timeit.Timer(fn).autorange()
+    times = [t / number for t in timeit.Timer(fn).repeat(repeat=repeats, number=number)]
+    return {"median_s": statistics.median(times), "min_s": min(times), "repeats": repeats, "number": number}
+
+
+def environment():
+    import sklearn
+    import xgboost
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "xgboost": xgboost.__version__,
+    }
+
+
+def run_benchmarks(only=None, config=None):
+    stages = _Stages(dict(train_pipeline.DEFAULT_CONFIG, **(config or {})))
+    results = {}
+    for name, setup, repeats in BENCHMARKS:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        result = measure(setup(stages), repeats)
+        results[name] = result
+        print(f"{name:<24} {result['median_s'] * 1000:>12.3f} ms  (min {result['min_s'] * 1000:.3f} ms, "
+              f"{result['number']} x {repeats})", flush=True)
+    return {"timestamp": time.time(), "environment": environment(), "results": results}
+
+
+# Benchmarks whose median grew by more than `tolerance` over the baseline,
+# as (name, baseline_s, current_s)
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference and result["median_s"] > reference["median_s"] * (1 + tolerance):
+            regressions.append((name, reference["median_s"], result["median_s"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time ingestion, training stages and inference.")
+    parser.add_argument("--only", nargs="+", help="run only benchmarks whose name starts with one of these")
+    parser.add_argument("--output", default=RESULTS_PATH, help="JSON results file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown as a fraction (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.only)
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.tolerance)
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms ({after / before - 1:+.0%})")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from features import GENDER_MAP, SMOKING_MAP
+from model_registry import BASE_DIR
+
+CUBES_PATH = os.path.join(BASE_DIR, "data", "dataset_cubes.npz")
+DEFAULT_CHUNKSIZE = 100_000
+
+# Dimensions of the cube: (dataset column, bin edges, labels). Coded
+# columns have no edges and one cell per code; binned ones have one cell
+# per interval, each including its lower edge.
+DIMENSIONS = {
+    "gender": ("gender", None, sorted(GENDER_MAP, key=GENDER_MAP.get)),
+    "age_band": ("age", (10, 20, 30, 40, 50, 60, 70, 80),
+                 ("0-9", "10-19", "20-29", "30-39", "40-49", "50-59", "60-69", "70-79", "80+")),
+    "bmi_bucket": ("bmi", (18.5, 25, 30, 35, 40),
+                   ("Underweight", "Normal", "Overweight", "Obese I", "Obese II", "Obese III")),
+    "hba1c_band": ("HbA1c_level", (5.0, 5.7, 6.5, 7.0, 8.0),
+                   ("<5.0", "5.0-5.6", "5.7-6.4", "6.5-6.9", "7.0-7.9", "8.0+")),
+    "smoking_history": ("smoking_history", None, sorted(SMOKING_MAP, key=SMOKING_MAP.get)),
+}
+
+
+def _shape():
+    return tuple(len(labels) for _, _, labels in DIMENSIONS.values())
+
+
+# Flat cube cell of every row of a dataset chunk (categoricals as codes).
+# Values are rounded to the CSV's two decimals first, so an HbA1c of 5.7
+# that picked up float noise (5.6999998) still lands in the 5.7 band.
+def cell_index(chunk):
+    codes = []
+    for column, edges, _ in DIMENSIONS.values():
+        values = np.asarray(chunk[column])
+        if edges is None:
+            codes.append(values.astype(np.int64))
+        else:
+            codes.append(np.searchsorted(edges, np.round(values.astype(np.float64), 2), side="right"))
+    return np.ravel_multi_index(codes, _shape())
+
+
+def _iter_chunks(path, chunksize, dedupe):
+    from dataset import DigestSet, dedupe_chunk, iter_dataset_chunks
+
+    if not dedupe:
+        yield from iter_dataset_chunks(path, chunksize)
+        return
+    seen = DigestSet()
+    for chunk in iter_dataset_chunks(path, chunksize):
+        yield dedupe_chunk(chunk, seen)[0]
+
+
+# Row and diabetes counts in every cell of the full cube, streamed chunk by
+# chunk: memory is one chunk plus the cube (plus 8 bytes per distinct row
+# when deduplicating, as the training pipeline does)
+def build_cubes(path=None, chunksize=DEFAULT_CHUNKSIZE, dedupe=True):
+    from dataset import DATASET_PATH
+
+    path = path or DATASET_PATH
+    size = int(np.prod(_shape()))
+    rows = np.zeros(size, dtype=np.int64)
+    positives = np.zeros(size, dtype=np.int64)
+    for chunk in _iter_chunks(path, chunksize, dedupe):
+        cells = cell_index(chunk)
+        rows += np.bincount(cells, minlength=size)
+        positives += np.bincount(cells[np.asarray(chunk["diabetes"]) == 1], minlength=size)
+    meta = {
+        "source": os.path.basename(path),
+        "deduplicated": dedupe,
+        "built": time.time(),
+        "dimensions": {name: {"column": column, "edges": edges, "labels": list(labels)}
+                       for name, (column, edges, labels) in DIMENSIONS.items()},
+    }
+    return Cube(rows.reshape(_shape()), positives.reshape(_shape()), meta)
+
+
+# Dense counts over every combination of the binned dimensions. Any
+# group-by is a sum over the other axes of a few thousand cells, however
+# many rows the dataset had.
+class Cube:
+    def __init__(self, rows, positives, meta):
+        self.rows = rows
+        self.positives = positives
+        self.meta = meta
+        self.dimensions = list(meta["dimensions"])
+
+    def labels(self, dimension):
+        return self.meta["dimensions"][dimension]["labels"]
+
+    # Rows, diabetes cases and rate per combination of `group_by`
+    # dimensions, counting only rows whose labels are in `filters`
+    # ({dimension: [label, ...]}). Returns a DataFrame.
+    def aggregate(self, group_by, filters=None):
+        import pandas as pd
+
+        rows, positives = self.rows, self.positives
+        for dimension, labels in (filters or {}).items():
+            axis = self.dimensions.index(dimension)
+            keep = [self.labels(dimension).index(label) for label in labels]
+            rows, positives = rows.take(keep, axis=axis), positives.take(keep, axis=axis)
+        group_by = list(group_by)
+        other = tuple(i for i, dimension in enumerate(self.dimensions) if dimension not in group_by)
+        # The summed cube keeps the remaining axes in cube order; put them
+        # in group_by order
+        axes = np.argsort(np.argsort([self.dimensions.index(dimension) for dimension in group_by]))
+        rows, positives = rows.sum(axis=other).transpose(axes), positives.sum(axis=other).transpose(axes)
+
+        kept = [list(filters[d]) if filters and d in filters else self.labels(d) for d in group_by]
+        index = pd.MultiIndex.from_product(kept, names=group_by) if group_by else [0]
+        frame = pd.DataFrame({"rows": rows.ravel(), "diabetes": positives.ravel()}, index=index)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frame["rate"] = np.where(frame["rows"] > 0, frame["diabetes"] / frame["rows"], np.nan)
+        return frame.reset_index() if group_by else frame
+
+
+def save_cubes(cube, path=CUBES_PATH):
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, rows=cube.rows, positives=cube.positives, meta=np.array(json.dumps(cube.meta)))
+    os.replace(tmp, path)
+
+
+def load_cubes(path=CUBES_PATH):
+    with np.load(path, allow_pickle=False) as data:
+        return Cube(data["rows"], data["positives"], json.loads(str(data["meta"])))
+
+
+_lock = threading.Lock()
+_cubes_cache = {}
+
+
+# Cube read once per file mtime (rebuilding the file is picked up without
+# a restart); None when it has not been built
+def get_cubes(path=CUBES_PATH):
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    cached = _cubes_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with _lock:
+            cached = (mtime, load_cubes(path))
+            _cubes_cache[path] = cached
+    return cached[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-aggregate the dataset into group-by cubes for the explorer.")
+    parser.add_argument("--dataset", default=None, help="CSV to aggregate (default: the training dataset)")
+    parser.add_argument("--output", default=CUBES_PATH)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="count duplicate rows (the training pipeline drops them)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    cube = build_cubes(args.dataset, args.chunksize, dedupe=not args.keep_duplicates)
+    save_cubes(cube, args.output)
+    print(f"{int(cube.rows.sum())} rows aggregated into {cube.rows.size} cells in "
+          f"{time.perf_counter() - start:.1f}s; written to {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
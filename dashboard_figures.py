@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+
+from model_registry import BASE_DIR
+
+STATS_PATH = os.path.join(BASE_DIR, "data", "malaysia_statistics.json")
+
+_lock = threading.Lock()
+_stats_cache = {}
+_figure_cache = {}
+
+
+# (mtime, statistics), read once per file mtime
+def _load_with_mtime(path):
+    mtime = os.path.getmtime(path)
+    cached = _stats_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding="utf-8") as f:
+            cached = (mtime, json.load(f))
+        _stats_cache[path] = cached
+    return cached
+
+
+# Malaysian statistics, read once per file mtime
+def load_statistics(path=STATS_PATH):
+    return _load_with_mtime(path)[1]
+
+
+# Build the dashboard figures with plain graph_objects. Returns
+# {name: figure JSON}; the donut charts are "type_0", "type_1", ...
+def build_figures(stats):
+    import plotly.graph_objects as go
+
+    figures = {}
+    for i, item in enumerate(stats["diabetes_types"]):
+        diabetes_type, percentage = item["label"], item["percentage"]
+        fig = go.Figure(data=[go.Pie(
+            labels=['', diabetes_type],
+            values=[100-percentage, percentage],
+            hole=.7,
+            marker_colors=['#E8E8E8', '#1f77b4'] if 'Type 2' in diabetes_type else ['#E8E8E8', '#89CFF0']
+        )])
+        fig.update_layout(
+            annotations=[dict(text=f'{percentage}%', x=0.5, y=0.5, font_size=20, showarrow=False)],
+            showlegend=False,
+            height=200,
+            margin=dict(l=0, r=0, t=30, b=30),
+            paper_bgcolor='white'
+        )
+        figures[f"type_{i}"] = fig
+
+    fig_gender = go.Figure(data=[go.Pie(
+        labels=[item["label"] for item in stats["gender"]],
+        values=[item["percentage"] for item in stats["gender"]],
+        marker_colors=['#86eae9', '#3b6696'],
+        textposition='inside',
+        textinfo='percent+label'
+    )])
+    fig_gender.update_layout(
+        paper_bgcolor='white',
+        margin=dict(l=0, r=0, t=30, b=30),
+        height=300
+    )
+    figures["gender"] = fig_gender
+
+    fig_ethnic = go.Figure(data=[go.Bar(
+        x=[item["label"] for item in stats["ethnicity"]],
+        y=[item["percentage"] for item in stats["ethnicity"]],
+        marker_color=['#00589c', '#19aade', '#1ac9e6', '#6dfdd2']
+    )])
+    fig_ethnic.update_layout(
+        xaxis_title="Ethnicity",
+        yaxis_title="Percentage (%)",
+        showlegend=False,
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        margin=dict(l=10, r=10, t=30, b=30),
+        height=300
+    )
+    figures["ethnicity"] = fig_ethnic
+
+    return {name: fig.to_json() for name, fig in figures.items()}
+
+
+# Serialized figures for the current statistics, rebuilt whenever the file
+# changes (same mtime key as load_statistics, so totals and charts always
+# come from the same read)
+def get_dashboard_figures(path=STATS_PATH):
+    mtime, stats = _load_with_mtime(path)
+    cached = _figure_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with _lock:
+            cached = _figure_cache.get(path)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, build_figures(stats))
+                _figure_cache[path] = cached
+    return cached[1]
+
+
+# Figure dict ready for st.plotly_chart
+def get_figure(name, path=STATS_PATH):
+    return json.loads(get_dashboard_figures(path)[name])
+
+
+# Compare a cold render (figures built from scratch) with warm cache hits
+def main():
+    start = time.perf_counter()
+    cold = {name: get_figure(name) for name in get_dashboard_figures()}
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    runs = 100
+    start = time.perf_counter()
+    for _ in range(runs):
+        warm = {name: get_figure(name) for name in get_dashboard_figures()}
+    warm_ms = (time.perf_counter() - start) * 1000 / runs
+
+    assert cold == warm
+    print(f"Cold render (import plotly + build {len(cold)} figures): {cold_ms:.1f} ms")
+    print(f"Warm render (cached figure JSON): {warm_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import hashlib
+import os
+import shutil
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, GENDER_MAP, LABEL_COLUMN, SMOKING_MAP
+from model_registry import BASE_DIR
+
+DATASET_PATH = os.path.join(BASE_DIR, "diabetes_prediction_dataset.csv")
+CACHE_DIR = os.path.join(BASE_DIR, ".dataset_cache")
+
+# Categories listed in code order, so the parsed category codes are exactly
+# the notebook's encoding
+CATEGORICAL_COLUMNS = {
+    "gender": sorted(GENDER_MAP, key=GENDER_MAP.get),
+    "smoking_history": sorted(SMOKING_MAP, key=SMOKING_MAP.get),
+}
+
+# Declared schema of diabetes_prediction_dataset.csv. Fractional columns
+# parse at float64, as inference.encode_many does: XGBoost splits sit on
+# training values, so training on float32-rounded values (6.6 becomes
+# 6.5999999) would move the decision boundary away from what serving sends.
+SCHEMA = {
+    "gender": pd.CategoricalDtype(CATEGORICAL_COLUMNS["gender"]),
+    "age": "float64",
+    "hypertension": "int8",
+    "heart_disease": "int8",
+    "smoking_history": pd.CategoricalDtype(CATEGORICAL_COLUMNS["smoking_history"]),
+    "bmi": "float64",
+    "HbA1c_level": "float64",
+    "blood_glucose_level": "int16",
+    "diabetes": "int8",
+}
+# Changes whenever SCHEMA does, so caches of parsed data are rebuilt
+SCHEMA_HASH = hashlib.sha256(repr(sorted((k, repr(v)) for k, v in SCHEMA.items())).encode()).hexdigest()[:16]
+
+
+def _have_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Parse the CSV with the declared schema. Categoricals come back as int8
+# codes (gender: Female=0, Male=1, Other=2; smoking_history as in SMOKING_MAP).
+# engine="pyarrow" uses the optional pyarrow parser.
+def read_dataset(path=DATASET_PATH, engine="c"):
+    return _to_codes(pd.read_csv(path, dtype=SCHEMA, engine=engine), path)
+
+
+# Same as read_dataset, chunk by chunk, for files larger than memory
+def iter_dataset_chunks(path=DATASET_PATH, chunksize=100_000):
+    for chunk in pd.read_csv(path, dtype=SCHEMA, chunksize=chunksize):
+        yield _to_codes(chunk, path)
+
+
+def _to_codes(data, path):
+    for column in CATEGORICAL_COLUMNS:
+        if data[column].isna().any():
+            raise ValueError(f"Unknown or missing {column} values in {path}")
+        data[column] = data[column].cat.codes.astype("int8")
+    return data
+
+
+def _cache_path(path, cache_dir, dedupe):
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}:{dedupe}:{SCHEMA_HASH}"
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}-{hashlib.sha256(key.encode()).hexdigest()[:16]}")
+
+
+# Columns of the cleaned table as read-only memory-mapped arrays. The first
+# call parses the CSV and writes one .npy per column; later calls only map
+# those files, until the CSV changes.
+def load_columns(path=DATASET_PATH, dedupe=True, cache_dir=CACHE_DIR, engine="c"):
+    cache_path = _cache_path(path, cache_dir, dedupe)
+    if not os.path.isdir(cache_path):
+        data = read_dataset(path, engine)
+        if dedupe:
+            data = data.drop_duplicates(ignore_index=True)
+        tmp = cache_path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for column in data.columns:
+            np.save(os.path.join(tmp, f"{column}.npy"), data[column].to_numpy())
+        shutil.rmtree(cache_path, ignore_errors=True)
+        os.rename(tmp, cache_path)
+
+    return {column: np.load(os.path.join(cache_path, f"{column}.npy"), mmap_mode="r") for column in SCHEMA}
+
+
+# Set of 64-bit row digests stored as sorted uint64 runs, merged like a
+# binary counter: 8 bytes per unique row, O(log n) runs to search
+class DigestSet:
+    def __init__(self):
+        self._runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self._runs)
+
+    def contains(self, digests):
+        found = np.zeros(len(digests), dtype=bool)
+        for run in self._runs:
+            index = np.minimum(np.searchsorted(run, digests), len(run) - 1)
+            found |= run[index] == digests
+        return found
+
+    def add(self, digests):
+        run = np.unique(digests)
+        # A chunk of nothing but duplicates adds nothing (and an empty run
+        # would have no last element for contains() to clip to)
+        if not len(run):
+            return
+        while self._runs and len(self._runs[-1]) <= len(run):
+            run = np.union1d(self._runs.pop(), run)
+        self._runs.append(run)
+
+
+# Drop rows already seen, in this chunk or any earlier one (`seen` is a
+# DigestSet shared across the chunks). Returns (kept rows, their digests).
+def dedupe_chunk(chunk, seen):
+    digests = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    _, first = np.unique(digests, return_index=True)
+    keep = np.zeros(len(chunk), dtype=bool)
+    keep[first] = True
+    keep &= ~seen.contains(digests)
+    seen.add(digests[keep])
+    return chunk[keep], digests[keep]
+
+
+# Cleaned (optionally deduplicated), encoded dataset as a typed DataFrame
+def load_dataset(path=DATASET_PATH, dedupe=True, cache_dir=CACHE_DIR, engine="c"):
+    return pd.DataFrame(load_columns(path, dedupe, cache_dir, engine))
+
+
+# Feature matrix (float64, FEATURE_COLUMNS order) and labels of a loaded table
+def features_and_labels(data):
+    X = np.column_stack([np.asarray(data[column], dtype=np.float64) for column in FEATURE_COLUMNS])
+    return X, np.asarray(data[LABEL_COLUMN])
+
+
+# The notebook's approach: inferred dtypes, drop_duplicates, nested-dict replace
+def _notebook_load(path):
+    data = pd.read_csv(path)
+    data.drop_duplicates(inplace=True)
+    data.replace({"gender": GENDER_MAP, "smoking_history": SMOKING_MAP}, inplace=True)
+    return data
+
+
+def _measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    size = data.memory_usage(deep=True).sum() / 2**20
+    print(f"{label:<28} {elapsed * 1000:>9.1f} {peak:>9.1f} {size:>9.1f} {len(data):>8}")
+
+
+# Load time and memory of the notebook's approach against the typed loader
+def compare(path=DATASET_PATH):
+    cache_dir = os.path.join(CACHE_DIR, "compare")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    print(f"{'approach':<28} {'time_ms':>9} {'peak_mb':>9} {'table_mb':>9} {'rows':>8}")
+    _measure("notebook (infer + replace)", lambda: _notebook_load(path))
+    _measure("typed, c engine", lambda: read_dataset(path, "c").drop_duplicates())
+    if _have_pyarrow():
+        _measure("typed, pyarrow engine", lambda: read_dataset(path, "pyarrow").drop_duplicates())
+    _measure("typed, first cached load", lambda: load_dataset(path, cache_dir=cache_dir))
+    _measure("typed, cached (mmap)", lambda: load_dataset(path, cache_dir=cache_dir))
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Typed loader for diabetes_prediction_dataset.csv.")
+    parser.add_argument("path", nargs="?", default=DATASET_PATH)
+    parser.add_argument("--compare", action="store_true", help="compare against the notebook's loading code")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(args.path)
+    else:
+        data = load_dataset(args.path)
+        print(data.dtypes)
+        print(f"{len(data)} rows, {data.memory_usage(deep=True).sum() / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import argparse
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from model_registry import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_PATH = os.path.join(BASE_DIR, "drift_reference.json")
+DRIFT_LOG_PATH = os.path.join(BASE_DIR, "drift_log.jsonl")
+
+# Coded features get one bin per category; the rest get bins holding equal
+# shares of the training rows (fewer where values repeat, as for HbA1c)
+CATEGORICAL_FEATURES = ("gender", "hypertension", "heart_disease", "smoking_history")
+NUMERIC_BINS = 20
+REFERENCE_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+# Seconds per drift window, and the fewest requests a window needs before
+# it is scored (small windows are all noise)
+DEFAULT_WINDOW = 3600.0
+MIN_WINDOW_COUNT = 200
+# PSI above 0.2 is the usual "significant shift"; KS is the largest gap
+# between the binned reference and live CDFs
+PSI_THRESHOLD = 0.2
+KS_THRESHOLD = 0.1
+# Added to empty bins so PSI stays finite
+EPSILON = 1e-4
+
+
+# ----- Reference sketches (built at training time) -----
+
+def _numeric_sketch(values):
+    values = values[~np.isnan(values)]
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, NUMERIC_BINS + 1)[1:-1]))
+    # Move each edge halfway down to the next smaller value in the data, so
+    # no value sits on an edge and float rounding noise cannot flip its bin
+    distinct = np.unique(values)
+    below = np.searchsorted(distinct, edges) - 1
+    edges = np.round(np.where(below >= 0, (distinct[np.maximum(below, 0)] + edges) / 2, edges), 6)
+    counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    return {
+        "kind": "numeric",
+        "edges": edges.tolist(),
+        "counts": counts.tolist(),
+        "quantiles": dict(zip(map(str, REFERENCE_QUANTILES), np.quantile(values, REFERENCE_QUANTILES).tolist())),
+    }
+
+
+def _categorical_sketch(values):
+    codes = values[~np.isnan(values)].astype(np.int64)
+    categories = np.unique(codes)
+    counts = [int(np.sum(codes == c)) for c in categories]
+    # Last bin collects codes never seen in training
+    return {"kind": "categorical", "categories": categories.tolist(), "counts": counts + [0]}
+
+
+# Compact per-feature sketches of an encoded, unscaled feature matrix
+def build_reference(X):
+    X = np.asarray(X, dtype=np.float64)
+    features = {}
+    for i, column in enumerate(FEATURE_COLUMNS):
+        if column in CATEGORICAL_FEATURES:
+            features[column] = _categorical_sketch(X[:, i])
+        else:
+            features[column] = _numeric_sketch(X[:, i])
+    return {"rows": len(X), "features": features}
+
+
+def save_reference(reference, path=REFERENCE_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(reference, f, indent=1)
+    os.replace(tmp, path)
+
+
+def load_reference(path=REFERENCE_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ----- Drift scores -----
+
+def _proportions(counts):
+    counts = np.asarray(counts, dtype=np.float64)
+    return (counts + EPSILON) / (counts.sum() + EPSILON * len(counts))
+
+
+# Population stability index between two binned distributions
+def psi(reference_counts, live_counts):
+    expected, actual = _proportions(reference_counts), _proportions(live_counts)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+# Kolmogorov-Smirnov statistic on the shared bins
+def binned_ks(reference_counts, live_counts):
+    expected = np.cumsum(reference_counts) / max(np.sum(reference_counts), 1)
+    actual = np.cumsum(live_counts) / max(np.sum(live_counts), 1)
+    return float(np.max(np.abs(expected - actual)))
+
+
+# Live quantile estimated from a binned histogram (linear inside a bin;
+# the open-ended first and last bins are pinned to their inner edge)
+def binned_quantile(edges, counts, q):
+    counts = np.asarray(counts, dtype=np.float64)
+    if not counts.sum():
+        return None
+    rank = q * counts.sum()
+    cumulative = np.cumsum(counts)
+    i = int(np.searchsorted(cumulative, rank))
+    if i == 0:
+        return edges[0]
+    if i >= len(edges):
+        return edges[-1]
+    lower, upper = edges[i - 1], edges[i]
+    fraction = (rank - cumulative[i - 1]) / counts[i]
+    return float(lower + (upper - lower) * fraction)
+
+
+# Counts of the rows of X in the reference bins, per feature
+def bin_counts(reference, X):
+    X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+    counts = {}
+    for i, column in enumerate(FEATURE_COLUMNS):
+        sketch = reference["features"][column]
+        values = X[:, i][~np.isnan(X[:, i])]
+        size = len(sketch["counts"])
+        if sketch["kind"] == "numeric":
+            index = np.searchsorted(sketch["edges"], values, side="right")
+        else:
+            categories = np.asarray(sketch["categories"], dtype=np.float64)
+            index = np.minimum(np.searchsorted(categories, values), len(categories) - 1)
+            index[categories[index] != values] = size - 1
+        counts[column] = np.bincount(index, minlength=size)
+    return counts
+
+
+# Per-feature drift of a window of live counts against the reference
+def drift_report(reference, live_counts, psi_threshold=PSI_THRESHOLD, ks_threshold=KS_THRESHOLD):
+    report = {}
+    for column in FEATURE_COLUMNS:
+        sketch = reference["features"][column]
+        counts = live_counts[column]
+        row = {"count": int(np.sum(counts)), "psi": psi(sketch["counts"], counts)}
+        if sketch["kind"] == "numeric":
+            row["ks"] = binned_ks(sketch["counts"], counts)
+            row["median"] = binned_quantile(sketch["edges"], counts, 0.5)
+            row["reference_median"] = sketch["quantiles"]["0.5"]
+        else:
+            row["unseen"] = int(counts[-1])
+        row["drifted"] = row["psi"] >= psi_threshold or row.get("ks", 0.0) >= ks_threshold
+        report[column] = row
+    return report
+
+
+# ----- Live sketches (updated on the request path) -----
+
+# Keeps live counts in the reference bins. update() is a handful of
+# bisects and list increments per request and takes no lock: each thread
+# counts into its own shard, as in metrics.Histogram. Counts only grow; a
+# background thread scores the difference between window snapshots.
+class DriftMonitor:
+    def __init__(self, reference, window=DEFAULT_WINDOW, log_path=DRIFT_LOG_PATH, min_count=MIN_WINDOW_COUNT):
+        self.reference = reference
+        self.window = window
+        self.log_path = log_path
+        self.min_count = min_count
+        self.last_report = None
+        self._binners = []
+        for column in FEATURE_COLUMNS:
+            sketch = reference["features"][column]
+            if sketch["kind"] == "numeric":
+                self._binners.append(("numeric", sketch["edges"], len(sketch["counts"])))
+            else:
+                categories = {c: i for i, c in enumerate(sketch["categories"])}
+                self._binners.append(("categorical", categories, len(sketch["counts"])))
+        self._shards = {}
+        self._previous = self.snapshot()
+        self._thread = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+        self._thread.start()
+
+    def _shard(self):
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(
+                threading.get_ident(), [[0] * size for _, _, size in self._binners],
+            )
+        return shard
+
+    # Count one encoded (unscaled) feature row
+    def update(self, row):
+        shard = self._shard()
+        for counts, (kind, bins, size), value in zip(shard, self._binners, row):
+            if value != value:
+                continue
+            if kind == "numeric":
+                counts[bisect.bisect_right(bins, value)] += 1
+            else:
+                counts[bins.get(int(value), size - 1)] += 1
+
+    # Count many rows at once (batch predictions)
+    def update_many(self, rows):
+        shard = self._shard()
+        window = bin_counts(self.reference, rows)
+        for counts, column in zip(shard, FEATURE_COLUMNS):
+            for i, number in enumerate(window[column].tolist()):
+                counts[i] += number
+
+    # Cumulative live counts per feature, summed over threads
+    def snapshot(self):
+        totals = {column: np.zeros(size, dtype=np.int64)
+                  for column, (_, _, size) in zip(FEATURE_COLUMNS, self._binners)}
+        for shard in list(self._shards.values()):
+            for column, counts in zip(FEATURE_COLUMNS, shard):
+                totals[column] += counts
+        return totals
+
+    # Score the requests since the previous check and append to the log.
+    # Windows with fewer than min_count requests roll over into the next.
+    def check(self):
+        current = self.snapshot()
+        window = {column: current[column] - self._previous[column] for column in FEATURE_COLUMNS}
+        if int(window[FEATURE_COLUMNS[0]].sum()) < self.min_count:
+            return None
+        self._previous = current
+        report = drift_report(self.reference, window)
+        self.last_report = {"timestamp": time.time(), "pid": os.getpid(), "features": report}
+        drifted = [column for column, row in report.items() if row["drifted"]]
+        if drifted:
+            logger.warning("Input drift detected in %s", ", ".join(drifted))
+        with open(self.log_path, "a") as f:
+            f.write(json.dumps(self.last_report) + "\n")
+        return report
+
+    def _run(self):
+        while True:
+            time.sleep(self.window)
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Drift check failed")
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+# Process-wide monitor, or None when there is no reference file (see
+# train_pipeline.py, or `python drift.py --build-reference`).
+# DIASCAN_DRIFT_REFERENCE, DIASCAN_DRIFT_WINDOW (seconds) and
+# DIASCAN_DRIFT_LOG override the defaults.
+def get_drift_monitor():
+    global _monitor
+    if _monitor is None:
+        path = os.environ.get("DIASCAN_DRIFT_REFERENCE", REFERENCE_PATH)
+        if not os.path.exists(path):
+            return None
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = DriftMonitor(
+                    load_reference(path),
+                    window=float(os.environ.get("DIASCAN_DRIFT_WINDOW", DEFAULT_WINDOW)),
+                    log_path=os.environ.get("DIASCAN_DRIFT_LOG", DRIFT_LOG_PATH),
+                )
+    return _monitor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reference sketches and drift scores for the model inputs.")
+    parser.add_argument("--build-reference", action="store_true",
+                        help="write reference sketches from the training dataset")
+    parser.add_argument("--compare", metavar="CSV",
+                        help="score a CSV of live inputs (dataset columns) against the reference")
+    parser.add_argument("--reference", default=REFERENCE_PATH)
+    args = parser.parse_args(argv)
+
+    if args.build_reference:
+        from dataset import features_and_labels, load_dataset
+
+        X, _ = features_and_labels(load_dataset())
+        save_reference(build_reference(X), args.reference)
+        print(f"Wrote reference sketches of {len(X)} rows to {args.reference}")
+    elif args.compare:
+        import pandas as pd
+
+        from inference import encode_many
+
+        reference = load_reference(args.reference)
+        X = encode_many(pd.read_csv(args.compare), errors="coerce")
+        print(f"{'feature':<22} {'psi':>7} {'ks':>7}  drifted")
+        for column, row in drift_report(reference, bin_counts(reference, X)).items():
+            ks = f"{row['ks']:>7.3f}" if "ks" in row else f"{'-':>7}"
+            print(f"{column:<22} {row['psi']:>7.3f} {ks}  {'YES' if row['drifted'] else ''}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from features import FEATURE_COLUMNS, GENDER_MAP, SMOKING_MAP, THRESHOLD
+from model_registry import BASE_DIR
+
+REPORT_PATH = os.path.join(BASE_DIR, "evaluation_report.json")
+
+METRICS = ("accuracy", "precision", "recall", "specificity", "f1")
+# Thresholds the bootstrap bands are computed on (the point-estimate curve
+# uses every distinct probability instead)
+CURVE_GRID = np.round(np.linspace(0, 1, 101), 2)
+DEFAULT_BOOTSTRAP = 2000
+CONFIDENCE = 0.95
+
+# Subgroup dimensions: (feature, labels by code). Age is cut into bands.
+AGE_BANDS = (18, 30, 40, 50, 60, 70)
+AGE_LABELS = ("0-17", "18-29", "30-39", "40-49", "50-59", "60-69", "70+")
+SUBGROUPS = {
+    "gender": ("gender", sorted(GENDER_MAP, key=GENDER_MAP.get)),
+    "age_band": ("age", AGE_LABELS),
+    "smoking_history": ("smoking_history", sorted(SMOKING_MAP, key=SMOKING_MAP.get)),
+}
+
+_data = {}
+
+
+# Held-out split the training pipeline evaluates on (same rows, same split
+# arguments), as unscaled features so subgroups can be read off them. The
+# CSV is encoded with inference.encode_many, so the model is scored on
+# exactly the float64 values it receives when serving.
+def load_test_split(test_size=None, random_state=None):
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    from dataset import DATASET_PATH
+    from features import LABEL_COLUMN
+    from inference import encode_many
+    from train_pipeline import DEFAULT_CONFIG
+
+    test_size = DEFAULT_CONFIG["test_size"] if test_size is None else test_size
+    random_state = DEFAULT_CONFIG["random_state"] if random_state is None else random_state
+
+    data = pd.read_csv(DATASET_PATH).drop_duplicates()
+    X, y = encode_many(data), data[LABEL_COLUMN].to_numpy()
+    _, X_test, _, y_test = train_test_split(X, y, test_size=test_size, stratify=y, random_state=random_state)
+    return X_test, y_test
+
+
+# Every row's group in each breakdown, flattened into one numbering: group
+# 0 is everyone, then each dimension's groups in SUBGROUPS order. Returns
+# (codes shaped (1 + dimensions, rows), [(dimension, label, group)]).
+def subgroup_codes(X):
+    X = np.asarray(X, dtype=np.float64)
+    codes = [np.zeros(len(X), dtype=np.int64)]
+    groups = [("overall", "all", 0)]
+    for dimension, (column, labels) in SUBGROUPS.items():
+        values = X[:, FEATURE_COLUMNS.index(column)]
+        if dimension == "age_band":
+            local = np.searchsorted(AGE_BANDS, values, side="right")
+        else:
+            local = values.astype(np.int64)
+        offset = len(groups)
+        codes.append(local + offset)
+        groups.extend((dimension, label, offset + i) for i, label in enumerate(labels))
+    return np.stack(codes), groups
+
+
+# Everything the metric computations need, computed once. Each (group,
+# distinct probability) pair gets a slot; slots are ordered by group, then
+# probability, so each group is one contiguous run and a bincount of row
+# weights gives the (negative, positive) counts of every group at once.
+# A group of k rows costs k slots, however many groups there are.
+def prepare(y, proba, codes=None, group_count=1):
+    y = np.asarray(y).astype(np.int64)
+    proba = np.asarray(proba, dtype=np.float64)
+    codes = np.zeros((1, len(y)), dtype=np.int64) if codes is None else np.asarray(codes)
+    group, score = codes.ravel(), np.tile(proba, len(codes))
+    order = np.lexsort((score, group))
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (np.diff(group[order]) != 0) | (np.diff(score[order]) != 0)
+    slot = np.empty(len(order), dtype=np.int64)
+    slot[order] = np.cumsum(new) - 1
+    slot_group, slot_score = group[order][new], score[order][new]
+    bounds = np.searchsorted(slot_group, np.arange(group_count + 1))
+    return {
+        "y": y,
+        "index": slot * 2 + np.tile(y, len(codes)),
+        "dimensions": len(codes),
+        "slot_group": slot_group,
+        "slot_score": slot_score,
+        "starts": bounds[:-1],
+        "ends": bounds[1:],
+    }
+
+
+# Slot of the first probability >= each threshold in each group, shape
+# (groups, thresholds). Probabilities are in [0, 1], so group * 2 +
+# probability orders the slots the same way as (group, probability).
+def threshold_slots(data, thresholds):
+    keys = data["slot_group"] * 2 + data["slot_score"]
+    groups = np.arange(len(data["starts"]))[:, None]
+    return np.searchsorted(keys, groups * 2 + np.asarray(thresholds)[None, :], side="left")
+
+
+# Weighted (negative, positive) counts per slot. Bootstrap resamples are
+# row weights, so no resample is ever re-sorted.
+def _counts(data, weights=None):
+    if weights is not None:
+        weights = np.tile(weights, data["dimensions"])
+    return np.bincount(data["index"], weights=weights, minlength=len(data["slot_group"]) * 2).reshape(-1, 2)
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), 0.0)
+
+
+# All threshold metrics of every group at once from slot counts. A row is
+# predicted positive when its probability >= the threshold, so the counts
+# at every threshold are differences of one cumulative sum over the slots.
+# Returns {metric: array (groups, thresholds)} plus "roc_auc" (groups,).
+def metrics_from_counts(data, counts, slots):
+    below = np.concatenate([np.zeros((1, 2)), np.cumsum(counts, axis=0)])
+    start, end = below[data["starts"]], below[data["ends"]]
+    negatives, positives = (end - start)[:, :1], (end - start)[:, 1:]
+    under = below[slots] - start[:, None, :]
+    fp, tp = negatives - under[..., 0], positives - under[..., 1]
+    fn, tn = positives - tp, negatives - fp
+    precision, recall = _ratio(tp, tp + fp), _ratio(tp, positives)
+    result = {
+        "accuracy": _ratio(tp + tn, positives + negatives),
+        "precision": precision,
+        "recall": recall,
+        "specificity": _ratio(tn, negatives),
+        "f1": _ratio(2 * precision * recall, precision + recall),
+    }
+    # Mann-Whitney ROC-AUC: each positive against the negatives of its group
+    # ranked below it, ties counting half
+    pairs = np.bincount(data["slot_group"], weights=counts[:, 1] * (below[1:, 0] - counts[:, 0] / 2),
+                        minlength=len(start))
+    pairs -= start[:, 0] * positives[:, 0]
+    result["roc_auc"] = _ratio(pairs, positives[:, 0] * negatives[:, 0])
+    return result
+
+
+# Every metric at every distinct probability, in one pass
+def threshold_curve(y, proba):
+    data = prepare(y, proba)
+    metrics = metrics_from_counts(data, _counts(data), threshold_slots(data, data["slot_score"]))
+    curve = {metric: values[0] for metric, values in metrics.items()}
+    curve["thresholds"] = data["slot_score"]
+    return curve
+
+
+# Metrics of one weighting of the rows (None for the point estimate) for
+# every group: (metrics shaped (groups, len(METRICS), thresholds),
+# roc_auc shaped (groups,))
+def _evaluate_weights(data, weights, slots):
+    metrics = metrics_from_counts(data, _counts(data, weights), slots)
+    return np.stack([metrics[m] for m in METRICS], axis=1), metrics["roc_auc"]
+
+
+def _init_worker(data, slots):
+    _data.update(data=data, slots=slots)
+
+
+# `resamples` bootstrap resamples from one seed, stacked
+def _bootstrap_chunk(seed, resamples):
+    data, slots = _data["data"], _data["slots"]
+    rng = np.random.default_rng(seed)
+    n = len(data["y"])
+    metrics, auc = [], []
+    for _ in range(resamples):
+        weights = np.bincount(rng.integers(0, n, n), minlength=n).astype(np.float64)
+        sample_metrics, sample_auc = _evaluate_weights(data, weights, slots)
+        metrics.append(sample_metrics)
+        auc.append(sample_auc)
+    return np.stack(metrics), np.stack(auc)
+
+
+# Run `resamples` bootstrap resamples across a process pool. Each worker
+# receives the prepared data once and returns only metric arrays:
+# (metrics shaped (resamples, groups, len(METRICS), thresholds), roc_auc
+# shaped (resamples, groups))
+def bootstrap(data, slots, resamples=DEFAULT_BOOTSTRAP, seed=42, workers=None):
+    workers = workers or os.cpu_count() or 1
+    chunk_count = min(resamples, workers * 4)
+    sizes = [len(part) for part in np.array_split(np.arange(resamples), chunk_count)]
+    seeds = np.random.SeedSequence(seed).spawn(chunk_count)
+    if workers == 1:
+        _init_worker(data, slots)
+        parts = [_bootstrap_chunk(s, size) for s, size in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data, slots)) as pool:
+            parts = list(pool.map(_bootstrap_chunk, seeds, sizes))
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+def _interval(value, samples, confidence):
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(samples, [tail, 100 - tail])
+    return {"value": float(value), "low": float(low), "high": float(high)}
+
+
+# Full report: metrics at `threshold` with bootstrap confidence intervals,
+# overall and per subgroup, plus the threshold curve (every distinct
+# probability) and bootstrap bands for it on CURVE_GRID
+def evaluate(y, proba, X, threshold=THRESHOLD, resamples=DEFAULT_BOOTSTRAP, confidence=CONFIDENCE, seed=42,
+             workers=None):
+    start = time.perf_counter()
+    codes, groups = subgroup_codes(X)
+    data = prepare(y, proba, codes, len(groups))
+    thresholds = np.unique(np.append(CURVE_GRID, threshold))
+    at = int(np.searchsorted(thresholds, threshold))
+    slots = threshold_slots(data, thresholds)
+
+    metrics, auc = _evaluate_weights(data, None, slots)
+    samples = bootstrap(data, slots, resamples, seed, workers) if resamples else None
+    rows = np.bincount(codes.ravel(), minlength=len(groups))
+    positives = np.bincount(codes.ravel(), weights=np.tile(data["y"], len(codes)), minlength=len(groups))
+
+    report = {
+        "threshold": threshold,
+        "rows": len(data["y"]),
+        "positives": int(data["y"].sum()),
+        "resamples": resamples,
+        "confidence": confidence,
+        "subgroups": {},
+    }
+    for dimension, label, g in groups:
+        if not rows[g]:
+            continue
+        if samples is None:
+            row = {m: {"value": float(metrics[g, i, at])} for i, m in enumerate(METRICS)}
+            row["roc_auc"] = {"value": float(auc[g])}
+        else:
+            row = {m: _interval(metrics[g, i, at], samples[0][:, g, i, at], confidence)
+                   for i, m in enumerate(METRICS)}
+            row["roc_auc"] = _interval(auc[g], samples[1][:, g], confidence)
+        row["rows"], row["positives"] = int(rows[g]), int(positives[g])
+        if dimension == "overall":
+            report["overall"] = row
+        else:
+            report["subgroups"].setdefault(dimension, {})[label] = row
+
+    curve = threshold_curve(y, proba)
+    report["curve"] = {key: values.tolist() for key, values in curve.items() if key != "roc_auc"}
+    if samples is not None:
+        tail = (1 - confidence) / 2 * 100
+        grid = np.searchsorted(thresholds, CURVE_GRID)
+        low, high = np.percentile(samples[0][:, 0][..., grid], [tail, 100 - tail], axis=0)
+        report["bands"] = {"thresholds": CURVE_GRID.tolist()}
+        for i, m in enumerate(METRICS):
+            report["bands"][m] = {"low": low[i].tolist(), "high": high[i].tolist()}
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def _format(cell):
+    if "low" in cell:
+        return f"{cell['value']:.3f} [{cell['low']:.3f}, {cell['high']:.3f}]"
+    return f"{cell['value']:.3f}"
+
+
+def print_report(report):
+    columns = METRICS + ("roc_auc",)
+    print(f"threshold {report['threshold']}, {report['rows']} rows ({report['positives']} positive), "
+          f"{report['resamples']} bootstrap resamples, {report['confidence']:.0%} intervals")
+    print(f"{'group':<28} {'rows':>6} " + " ".join(f"{m:>22}" for m in columns))
+    print(f"{'overall':<28} {report['rows']:>6} " + " ".join(f"{_format(report['overall'][m]):>22}" for m in columns))
+    for dimension, rows in report["subgroups"].items():
+        for label, row in rows.items():
+            print(f"{dimension + '=' + label:<28} {row['rows']:>6} "
+                  + " ".join(f"{_format(row[m]):>22}" for m in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the deployed model on the held-out split.")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--bootstrap", type=int, default=DEFAULT_BOOTSTRAP, help="bootstrap resamples (0: none)")
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    parser.add_argument("--seed", type=int, default=42, help="bootstrap seed")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--test-size", type=float, default=None, help="held-out fraction (default: the pipeline's)")
+    parser.add_argument("--output", default=REPORT_PATH, help="JSON report file")
+    args = parser.parse_args(argv)
+
+    from model_registry import get_registry
+
+    X_test, y_test = load_test_split(args.test_size)
+    proba = get_registry().get().predict_proba(X_test)
+    report = evaluate(y_test, proba, X_test, args.threshold, args.bootstrap, args.confidence, args.seed, args.workers)
+    print_report(report)
+    print(f"Evaluated in {report['seconds']:.2f}s; report written to {args.output}")
+    with open(args.output, "w") as f:
+        json.dump(report, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+# Model input columns, in the order the scaler and XGBoost model were fitted on
+FEATURE_COLUMNS = [
+    "gender",
+    "age",
+    "hypertension",
+    "heart_disease",
+    "smoking_history",
+    "bmi",
+    "HbA1c_level",
+    "blood_glucose_level",
+]
+LABEL_COLUMN = "diabetes"
+
+# Same categorical encoding as the DATA ENCODING cell of the notebook
+GENDER_MAP = {"Female": 0, "Male": 1, "Other": 2}
+SMOKING_MAP = {"never": 0, "No Info": 1, "current": 2, "former": 3, "ever": 4, "not current": 5}
+
+# Decision threshold tuned in the notebook
+THRESHOLD = 0.4
+
+# Cut-off every serving entry point labels with (the app, the HTTP API, the
+# batch CLI and the shadow comparison), so one record gets one answer
+# everywhere. It is the 0.5 the app has always used via XGBClassifier.predict;
+# THRESHOLD above is the notebook's evaluation cut-off.
+SERVING_THRESHOLD = 0.5
+
@@ -0,0 +1,200 @@
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from dataset import DATASET_PATH, DigestSet, dedupe_chunk, features_and_labels, iter_dataset_chunks
+from features import FEATURE_COLUMNS, THRESHOLD
+from model_registry import _save_pickle
+from train_pipeline import EXPORT_FILES, STAGING_DIR, _save_ensemble, promote, write_manifest
+
+DEFAULT_CHUNKSIZE = 100_000
+TEST_FRACTION = 0.2
+# Probability bins used for the streaming ROC-AUC
+AUC_BINS = 10_000
+
+# SMOTE is not possible out of core, so classes are balanced with
+# scale_pos_weight (added at train time from the pass 1 counts)
+DEFAULT_PARAMS = {
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "tree_method": "hist",
+    "seed": 42,
+}
+# Same number of rounds as the default XGBClassifier the notebook trains
+NUM_BOOST_ROUND = 100
+# Artifacts export() writes (all of train_pipeline's but the drift reference)
+INCREMENTAL_FILES = [name for name in EXPORT_FILES if name != "drift_reference.json"]
+
+
+def _max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Deterministic train/test assignment from the row digest, identical on every pass
+def _is_test(digests, test_fraction):
+    return digests % 10_000 < int(test_fraction * 10_000)
+
+
+def _scale(X, scaler):
+    return (X - scaler.mean_) / scaler.scale_
+
+
+# Deduplicated chunks, split into train/test by digest
+def iter_clean_chunks(path, chunksize, test_fraction):
+    seen = DigestSet()
+    for chunk in iter_dataset_chunks(path, chunksize):
+        chunk, digests = dedupe_chunk(chunk, seen)
+        X, y = features_and_labels(chunk)
+        yield X, y, _is_test(digests, test_fraction)
+
+
+# Pass 1: fit the StandardScaler with partial_fit (on all rows, as the
+# notebook does) and count the training classes for scale_pos_weight
+def fit_scaler(path, chunksize, test_fraction):
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    rows = positives = 0
+    for X, y, test in iter_clean_chunks(path, chunksize, test_fraction):
+        if len(X):
+            scaler.partial_fit(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+        rows += int(np.sum(~test))
+        positives += int(np.sum(y[~test] == 1))
+    return scaler, rows, positives
+
+
+# Feeds XGBoost one scaled training chunk at a time. With a cache_prefix,
+# XGBoost pages the quantized data to disk instead of holding it in memory.
+class TrainingChunks(xgb.DataIter):
+    def __init__(self, path, chunksize, scaler, test_fraction, cache_prefix):
+        self.path = path
+        self.chunksize = chunksize
+        self.scaler = scaler
+        self.test_fraction = test_fraction
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._chunks = None
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = iter_clean_chunks(self.path, self.chunksize, self.test_fraction)
+        for X, y, test in self._chunks:
+            if (~test).any():
+                input_data(data=_scale(X[~test], self.scaler), label=y[~test])
+                return True
+        return False
+
+
+def _external_memory_matrix(chunks):
+    if hasattr(xgb, "ExtMemQuantileDMatrix"):
+        return xgb.ExtMemQuantileDMatrix(chunks)
+    return xgb.DMatrix(chunks)
+
+
+# Stream the held-out rows through the booster. Probabilities are binned
+# per class, so memory does not grow with the test set; ROC-AUC comes from
+# the binned curve.
+def evaluate(booster, path, chunksize, scaler, test_fraction, threshold=THRESHOLD, bins=AUC_BINS):
+    histogram = np.zeros((2, bins), dtype=np.int64)
+    tp = fp = fn = tn = 0
+    for X, y, test in iter_clean_chunks(path, chunksize, test_fraction):
+        if not test.any():
+            continue
+        proba = booster.predict(xgb.DMatrix(_scale(X[test], scaler)))
+        y = y[test] == 1
+        prediction = proba >= threshold
+        tp += int(np.sum(prediction & y))
+        fp += int(np.sum(prediction & ~y))
+        fn += int(np.sum(~prediction & y))
+        tn += int(np.sum(~prediction & ~y))
+        index = np.minimum((proba * bins).astype(np.int64), bins - 1)
+        histogram[1] += np.bincount(index[y], minlength=bins)
+        histogram[0] += np.bincount(index[~y], minlength=bins)
+
+    # Sweep thresholds from high to low probability
+    tpr = np.concatenate([[0.0], np.cumsum(histogram[1][::-1]) / max(histogram[1].sum(), 1)])
+    fpr = np.concatenate([[0.0], np.cumsum(histogram[0][::-1]) / max(histogram[0].sum(), 1)])
+    total = tp + fp + fn + tn
+    return {
+        "test_rows": total,
+        "accuracy": (tp + tn) / total if total else 0.0,
+        "precision": tp / (tp + fp) if tp + fp else 0.0,
+        "recall": tp / (tp + fn) if tp + fn else 0.0,
+        "roc_auc": float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)),
+    }
+
+
+# Save in the same format as the notebook (a pickled XGBClassifier and
+# scaler) plus the compiled .npz ensembles, each written atomically. The
+# drift reference needs the whole matrix, so it is left to train_pipeline.py.
+def export(booster, scaler, export_dir):
+    from tree_export import export_booster
+
+    os.makedirs(export_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        model_json = os.path.join(tmp, "model.json")
+        booster.save_model(model_json)
+        classifier = xgb.XGBClassifier()
+        classifier.load_model(model_json)
+    ensemble = export_booster(booster)
+    _save_ensemble(ensemble, os.path.join(export_dir, "diabetes_prediction_model.npz"))
+    _save_ensemble(ensemble.fold_scaler(scaler.mean_, scaler.scale_),
+                   os.path.join(export_dir, "diabetes_prediction_fused.npz"))
+    _save_pickle(scaler, os.path.join(export_dir, "diabetes_prediction_scaler.sav"))
+    _save_pickle(classifier, os.path.join(export_dir, "diabetes_prediction_model.sav"))
+    write_manifest(export_dir, INCREMENTAL_FILES)
+
+
+def train(path, chunksize=DEFAULT_CHUNKSIZE, test_fraction=TEST_FRACTION, export_dir=STAGING_DIR, cache_dir=None,
+          num_boost_round=NUM_BOOST_ROUND):
+    start = time.perf_counter()
+    scaler, rows, positives = fit_scaler(path, chunksize, test_fraction)
+    print(f"pass 1 (dedupe + scaler): {rows} training rows, {positives} positive, "
+          f"{time.perf_counter() - start:.1f}s, max RSS {_max_rss_mb():.0f} MB")
+
+    params = dict(DEFAULT_PARAMS, scale_pos_weight=(rows - positives) / max(positives, 1))
+    with tempfile.TemporaryDirectory(dir=cache_dir) as tmp:
+        chunks = TrainingChunks(path, chunksize, scaler, test_fraction, os.path.join(tmp, "cache"))
+        start = time.perf_counter()
+        booster = xgb.train(params, _external_memory_matrix(chunks), num_boost_round=num_boost_round)
+        print(f"pass 2 (external-memory fit): {time.perf_counter() - start:.1f}s, max RSS {_max_rss_mb():.0f} MB")
+
+    start = time.perf_counter()
+    metrics = evaluate(booster, path, chunksize, scaler, test_fraction)
+    print(f"pass 3 (evaluate): {time.perf_counter() - start:.1f}s, max RSS {_max_rss_mb():.0f} MB")
+
+    export(booster, scaler, export_dir)
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train on a CSV larger than memory, chunk by chunk.")
+    parser.add_argument("path", nargs="?", default=DATASET_PATH)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--test-fraction", type=float, default=TEST_FRACTION)
+    parser.add_argument("--rounds", type=int, default=NUM_BOOST_ROUND, help="boosting rounds")
+    parser.add_argument("--export-dir", default=STAGING_DIR,
+                        help="where to write the model artifacts (default: a staging directory)")
+    parser.add_argument("--promote", action="store_true",
+                        help="after exporting, move the artifacts into place for serving")
+    parser.add_argument("--cache-dir", default=None, help="where XGBoost pages its external-memory cache")
+    args = parser.parse_args(argv)
+
+    metrics = train(args.path, args.chunksize, args.test_fraction, args.export_dir, args.cache_dir, args.rounds)
+    for name, value in metrics.items():
+        print(f"{name}: {value}")
+    if args.promote:
+        promote(args.export_dir, names=INCREMENTAL_FILES)
+        print(f"Promoted {args.export_dir}")
+
+
+if __name__ == "__main__":
+    main()
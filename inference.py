@@ -0,0 +1,171 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from audit import get_audit_log
+from drift import get_drift_monitor
+from features import FEATURE_COLUMNS, GENDER_MAP, SMOKING_MAP
+from metrics import observe, timer
+from model_registry import get_registry
+from prediction_cache import get_prediction_cache
+from shadow import get_shadow_evaluator
+
+# Categorical labels are matched case-insensitively, so the form labels
+# ("Not Current") and the dataset values ("not current") both work
+CATEGORY_CODES = {
+    "gender": {label.lower(): code for label, code in GENDER_MAP.items()},
+    "smoking_history": {label.lower(): code for label, code in SMOKING_MAP.items()},
+}
+BINARY_CODES = {"no": 0, "yes": 1, "false": 0, "true": 1, "0": 0, "1": 1}
+BINARY_COLUMNS = ("hypertension", "heart_disease")
+
+# Accepted (exclusive lower, inclusive upper) bounds of the numeric
+# features, the same limits as the prediction form
+NUMERIC_RANGES = {
+    "age": (0, 200),
+    "bmi": (0, 100),
+    "HbA1c_level": (0, 20),
+    "blood_glucose_level": (0, 1000),
+}
+
+# Invalid rows listed in a ValueError before the rest are summarized
+MAX_REPORTED_ERRORS = 5
+
+
+def _encode_value(column, value):
+    if column in CATEGORY_CODES:
+        return CATEGORY_CODES[column].get(str(value).strip().lower(), np.nan)
+    if column in BINARY_COLUMNS:
+        if isinstance(value, str):
+            return BINARY_CODES.get(value.strip().lower(), np.nan)
+        return float(value) if value in (0, 1) else np.nan
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    low, high = NUMERIC_RANGES[column]
+    return value if low < value <= high else np.nan
+
+
+# Encode one record keyed by the dataset column names (or the form labels)
+# into a feature row. Raises ValueError naming the first invalid field.
+def encode_one(record):
+    row = []
+    for column in FEATURE_COLUMNS:
+        if column not in record:
+            raise ValueError(f"Missing value for {column!r}")
+        code = _encode_value(column, record[column])
+        if code != code:
+            raise ValueError(f"Invalid value for {column!r}: {record[column]!r}")
+        row.append(code)
+    return row
+
+
+def _encode_column(values, column):
+    if column in CATEGORY_CODES:
+        return values.astype("string").str.strip().str.lower().map(CATEGORY_CODES[column]).to_numpy(
+            dtype=np.float64, na_value=np.nan)
+    if column in BINARY_COLUMNS:
+        if pd.api.types.is_numeric_dtype(values):
+            codes = values.to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+        else:
+            codes = values.astype("string").str.strip().str.lower().map(BINARY_CODES).to_numpy(
+                dtype=np.float64, na_value=np.nan)
+        codes[(codes != 0) & (codes != 1)] = np.nan
+        return codes
+    codes = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+    low, high = NUMERIC_RANGES[column]
+    with np.errstate(invalid="ignore"):
+        codes[~((codes > low) & (codes <= high))] = np.nan
+    return codes
+
+
+# Encode many records at once: a DataFrame shaped like the dataset, a dict
+# of columns, or a list of record dicts. Every column is validated and
+# encoded as a whole array. errors="raise" rejects the batch if any value
+# is missing or invalid; errors="coerce" turns those values into NaN,
+# which XGBoost treats as missing.
+def encode_many(records, errors="raise"):
+    if errors not in ("raise", "coerce"):
+        raise ValueError(f"errors must be 'raise' or 'coerce', not {errors!r}")
+    frame = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+    missing = [column for column in FEATURE_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    features = np.empty((len(frame), len(FEATURE_COLUMNS)), dtype=np.float64)
+    for i, column in enumerate(FEATURE_COLUMNS):
+        features[:, i] = _encode_column(frame[column], column)
+
+    if errors == "raise":
+        rows, columns = np.nonzero(np.isnan(features))
+        if len(rows):
+            messages = [
+                f"row {row}: invalid {FEATURE_COLUMNS[col]!r} value {frame[FEATURE_COLUMNS[col]].iloc[row]}"
+                for row, col in zip(rows[:MAX_REPORTED_ERRORS], columns[:MAX_REPORTED_ERRORS])
+            ]
+            if len(rows) > MAX_REPORTED_ERRORS:
+                messages.append(f"and {len(rows) - MAX_REPORTED_ERRORS} more")
+            raise ValueError("; ".join(messages))
+    return features
+
+
+# Probability of diabetes for one record. Goes through the process-wide
+# prediction cache, is queued for the audit log, is counted by the drift
+# monitor, and feeds the shadow evaluator when one is configured. Safe to call from any thread.
+def predict_one(record, registry=None, source="ui"):
+    row = encode_one(record)
+    with timer("model_get"):
+        bundle = (registry or get_registry()).get()
+
+    start = time.perf_counter()
+    probability = get_prediction_cache().predict(bundle, row)
+    elapsed = time.perf_counter() - start
+    observe("cached_predict", elapsed)
+
+    audit_log = get_audit_log()
+    if audit_log is not None:
+        audit_log.record(row, probability, bundle.version, source)
+
+    drift_monitor = get_drift_monitor()
+    if drift_monitor is not None:
+        drift_monitor.update(row)
+
+    shadow_evaluator = get_shadow_evaluator()
+    if shadow_evaluator is not None:
+        shadow_evaluator.submit(row, probability, bundle.version)
+    return probability
+
+
+# Probabilities for many records (see encode_many), scored in one
+# vectorized call, queued for the audit log and counted by the drift monitor. Safe to call from any thread.
+def predict_many(records, errors="raise", registry=None, source="api"):
+    features = encode_many(records, errors)
+    bundle = (registry or get_registry()).get()
+    probabilities = bundle.predict_proba(features)
+    audit_log = get_audit_log()
+    if audit_log is not None:
+        audit_log.record(features, probabilities, bundle.version, source)
+    drift_monitor = get_drift_monitor()
+    if drift_monitor is not None:
+        drift_monitor.update_many(features)
+    return probabilities
+
+
+# Per-feature contributions to the log-odds of one record, as
+# {feature: value, ..., "bias": value} (exact TreeSHAP). Cached with the
+# prediction, so explaining a result just shown costs one lookup after
+# the first time.
+def explain_one(record, registry=None):
+    bundle = (registry or get_registry()).get()
+    contributions = get_prediction_cache().explain(bundle, encode_one(record))
+    return dict(zip(FEATURE_COLUMNS + ["bias"], contributions))
+
+
+# Contributions for many records in one call, shape (rows, features + 1)
+# with the bias last. approximate=True uses XGBoost's path approximation,
+# which costs a few predictions instead of full TreeSHAP.
+def explain_many(records, errors="raise", approximate=False, registry=None):
+    features = encode_many(records, errors)
+    return (registry or get_registry()).get().contributions(features, approximate)
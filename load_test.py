@@ -0,0 +1,176 @@
+import argparse
+import csv
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from urllib.parse import urlparse
+
+import numpy as np
+
+from model_registry import BASE_DIR
+from prediction_service import create_server
+
+DATASET_PATH = os.path.join(BASE_DIR, "diabetes_prediction_dataset.csv")
+
+
+# Request bodies built from the first rows of the shipped dataset
+def load_sample_payloads(path=DATASET_PATH, count=1000):
+    payloads = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            row.pop("diabetes", None)
+            payloads.append(json.dumps(row).encode())
+            if len(payloads) >= count:
+                break
+    return payloads
+
+
+def _client(host, port, payloads, requests_per_client, latencies, errors):
+    conn = http.client.HTTPConnection(host, port)
+    headers = {"Content-Type": "application/json"}
+    for i in range(requests_per_client):
+        body = payloads[i % len(payloads)]
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/predict", body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+# Fire `concurrency` keep-alive clients at the service and summarize latency
+def run_load(host, port, payloads, concurrency, requests_per_client):
+    latencies = []
+    errors = []
+    threads = [
+        threading.Thread(target=_client, args=(host, port, payloads, requests_per_client, latencies, errors))
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": float(np.percentile(latencies_ms, 50)) if len(latencies) else float("nan"),
+        "p99_ms": float(np.percentile(latencies_ms, 99)) if len(latencies) else float("nan"),
+    }
+
+
+# Rss, Pss and private (unshared) memory of a process in MB. Pss splits
+# shared pages between the processes mapping them, so it shows the real
+# per-worker cost of a shared model.
+def process_memory(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def _worker_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def _wait_until_healthy(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Service on port {port} did not become healthy")
+
+
+# Start `prediction_service.py --workers N` for each N, load it, and report
+# throughput plus the memory of each worker
+def run_worker_sweep(worker_counts, payloads, concurrency, requests_per_client, port=8765):
+    print(f"{'workers':>7} {'req/s':>9} {'p50_ms':>8} {'p99_ms':>8} {'errors':>7} "
+          f"{'rss_mb':>8} {'pss_mb':>8} {'private_mb':>10}  (per worker)")
+    for workers in worker_counts:
+        service = subprocess.Popen(
+            [sys.executable, os.path.join(BASE_DIR, "prediction_service.py"), "--port", str(port),
+             "--workers", str(workers)],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            _wait_until_healthy(port)
+            result = run_load("127.0.0.1", port, payloads, concurrency, requests_per_client)
+            pids = _worker_pids(service.pid) if workers > 1 else [service.pid]
+            memory = [process_memory(pid) for pid in pids]
+        finally:
+            service.terminate()
+            service.wait()
+        mean = {key: float(np.mean([m[key] for m in memory])) for key in memory[0]}
+        print(f"{workers:>7} {result['throughput']:>9.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['errors']:>7} {mean['rss_mb']:>8.1f} {mean['pss_mb']:>8.1f} {mean['private_mb']:>10.1f}")
+
+
+def _print_result(window, result):
+    print(f"{window:>10} {result['requests']:>9} {result['errors']:>7} {result['throughput']:>9.0f} "
+          f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the prediction service at several batch windows.")
+    parser.add_argument("--url", help="test an already running service instead of starting one per window")
+    parser.add_argument("--windows", default="0,1,2,5,10", help="comma-separated batch windows in ms")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--workers", help="comma-separated pre-fork worker counts to compare, e.g. 1,4,16")
+    args = parser.parse_args(argv)
+
+    payloads = load_sample_payloads()
+    if args.workers:
+        run_worker_sweep([int(n) for n in args.workers.split(",")], payloads, args.concurrency, args.requests)
+        return
+
+    print(f"{'window_ms':>10} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50_ms':>8} {'p99_ms':>8}")
+
+    if args.url:
+        url = urlparse(args.url)
+        result = run_load(url.hostname, url.port or 80, payloads, args.concurrency, args.requests)
+        _print_result("-", result)
+        return
+
+    for window in args.windows.split(","):
+        server = create_server(port=0, window_ms=float(window))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            result = run_load("127.0.0.1", server.server_address[1], payloads, args.concurrency, args.requests)
+        finally:
+            server.shutdown()
+            server.server_close()
+        _print_result(window, result)
+
+
+if __name__ == "__main__":
+    main()
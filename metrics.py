@@ -0,0 +1,196 @@
+import bisect
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Log-spaced latency buckets (upper bounds, in seconds): four per doubling
+# from 1 µs to ~4.5 min, so any quantile is within ~19% of the true value
+BUCKET_BOUNDS = tuple(1e-6 * 2 ** (i / 4) for i in range(113))
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRICS_PATH = os.environ.get("DIASCAN_METRICS_PATH")
+# Seconds between rewrites of the metrics file
+DEFAULT_EXPORT_INTERVAL = 15.0
+
+
+# Latency histogram without a lock on the hot path: every thread counts
+# into its own shard, and readers sum the shards. A shard is only ever
+# written by its owner thread, so no update can be lost.
+class Histogram:
+    def __init__(self, bounds=BUCKET_BOUNDS):
+        self.bounds = bounds
+        self._shards = {}
+
+    def _shard(self):
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            # [bucket counts..., overflow count, sum of observations]
+            shard = self._shards.setdefault(threading.get_ident(), [0] * (len(self.bounds) + 1) + [0.0])
+        return shard
+
+    def observe(self, seconds):
+        shard = self._shard()
+        shard[bisect.bisect_left(self.bounds, seconds)] += 1
+        shard[-1] += seconds
+
+    # (bucket counts incl. overflow, total count, sum), summed over threads
+    def snapshot(self):
+        counts = [0] * (len(self.bounds) + 1)
+        total = 0.0
+        for shard in list(self._shards.values()):
+            for i in range(len(counts)):
+                counts[i] += shard[i]
+            total += shard[-1]
+        return counts, sum(counts), total
+
+    # Quantile estimate, interpolated inside the bucket as Prometheus'
+    # histogram_quantile does
+    def quantile(self, q, snapshot=None):
+        counts, count, _ = snapshot or self.snapshot()
+        if not count:
+            return None
+        rank = q * count
+        cumulative = 0
+        for i, bucket in enumerate(counts):
+            if bucket and cumulative + bucket >= rank:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - cumulative) / bucket
+            cumulative += bucket
+        return self.bounds[-1]
+
+
+_histograms = {}
+_collectors = {}
+
+
+def histogram(stage):
+    hist = _histograms.get(stage)
+    if hist is None:
+        hist = _histograms.setdefault(stage, Histogram())
+    return hist
+
+
+def observe(stage, seconds):
+    histogram(stage).observe(seconds)
+
+
+# Time a block into the stage's histogram:
+#     with timer("predict"):
+#         ...
+@contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram(stage).observe(time.perf_counter() - start)
+
+
+# {stage: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"}}
+def summary():
+    result = {}
+    for stage, hist in sorted(_histograms.items()):
+        snapshot = hist.snapshot()
+        _, count, total = snapshot
+        row = {"count": count, "mean_ms": total / count * 1000 if count else None}
+        for q in QUANTILES:
+            value = hist.quantile(q, snapshot)
+            row[f"p{int(q * 100)}_ms"] = value * 1000 if value is not None else None
+        result[stage] = row
+    return result
+
+
+# Add counters and gauges kept elsewhere (the prediction cache, the shadow
+# evaluator) to prometheus_text. `collect()` returns {metric name: (type,
+# help, value)}; None values are left out.
+def register_collector(name, collect):
+    _collectors[name] = collect
+
+
+def _collector_lines():
+    lines = []
+    for _, collect in sorted(_collectors.items()):
+        for metric, (kind, help_text, value) in collect().items():
+            if value is not None:
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}", f"{metric} {value:.9g}"]
+    return lines
+
+
+# Prometheus text exposition format: one histogram labelled by stage, then
+# the registered collectors. Only buckets up to the largest observed value
+# are written.
+def prometheus_text(name="diascan_stage_seconds"):
+    lines = [f"# HELP {name} Time spent per request stage.", f"# TYPE {name} histogram"]
+    for stage, hist in sorted(_histograms.items()):
+        counts, count, total = hist.snapshot()
+        last = max((i for i, c in enumerate(counts[:-1]) if c), default=0)
+        cumulative = 0
+        for bound, bucket in zip(hist.bounds[:last + 1], counts):
+            cumulative += bucket
+            lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {total:.9g}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+    lines += _collector_lines()
+    return "\n".join(lines) + "\n"
+
+
+# For node_exporter's textfile collector: write to a temp file and rename,
+# so a scrape never sees a half-written file. The temp name is unique per
+# call, so concurrent writers (threads or processes) cannot collide.
+def write_prometheus(path=None):
+    path = path or METRICS_PATH
+    if not path:
+        return
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                               dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        # mkstemp creates the file owner-only; the collector may run as another user
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "w") as f:
+            f.write(prometheus_text())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def _export_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_prometheus(path)
+        except Exception:
+            logger.exception("Writing %s failed", path)
+
+
+# Rewrite the metrics file every `interval` seconds on a daemon thread
+# (node_exporter scrapes on its own schedule, so per-request writes are
+# wasted work). Idempotent and a no-op when no path is configured;
+# DIASCAN_METRICS_INTERVAL overrides the interval.
+def start_prometheus_exporter(path=None, interval=None):
+    global _exporter
+    path = path or METRICS_PATH
+    if not path or _exporter is not None:
+        return
+    interval = interval or float(os.environ.get("DIASCAN_METRICS_INTERVAL", DEFAULT_EXPORT_INTERVAL))
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = threading.Thread(target=_export_loop, args=(path, interval), name="metrics-exporter",
+                                         daemon=True)
+            _exporter.start()
+
+
+def reset():
+    _histograms.clear()
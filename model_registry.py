@@ -0,0 +1,253 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from metrics import timer
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "diabetes_prediction_model.sav")
+SCALER_PATH = os.path.join(BASE_DIR, "diabetes_prediction_scaler.sav")
+
+# Seconds between checks of the artifacts on disk for a newer version
+CHECK_INTERVAL = 2.0
+# Content hashes of an exported artifact set (see train_pipeline.promote),
+# next to the model. Renamed into place after the artifacts, so while it
+# disagrees with them a deploy is still in progress.
+MANIFEST_NAME = "diabetes_prediction_manifest.json"
+
+
+# Cheap signature (mtime, size) used to notice that a file was replaced
+def _file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# Content hash of an artifact, used as part of the model version
+def _file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+# {file name: content hash} of the manifest next to `path`, or None
+def _read_manifest(path):
+    try:
+        with open(os.path.join(os.path.dirname(os.path.abspath(path)), MANIFEST_NAME)) as f:
+            return json.load(f)["files"]
+    except FileNotFoundError:
+        return None
+
+
+def _load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+# Pickle to a temporary file and rename it over `path`, so a reader never
+# sees a half-written artifact
+def _save_pickle(value, path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(value, f)
+    os.replace(tmp, path)
+
+
+# A compiled .npz tree ensemble (see tree_export.py) is served with NumPy
+# only; anything else is the pickled XGBClassifier
+def _load_model(path):
+    if path.endswith(".npz"):
+        from tree_model import TreeEnsemble
+
+        return TreeEnsemble.load(path)
+    return _load_pickle(path)
+
+
+# A loaded model and its scaler. Bundles are never mutated after creation,
+# so a caller holding one keeps a consistent pair even if a reload happens.
+# Scaling and prediction are timed into the "<prefix>scale" and
+# "<prefix>predict" stage histograms (see metrics.py).
+class ModelBundle:
+    def __init__(self, model, scaler, version, stage_prefix=""):
+        self.model = model
+        self.scaler = scaler
+        self.version = version
+        self.stage_prefix = stage_prefix
+
+    # Same model and scaler, timed under other stage names. Background and
+    # offline callers use it to stay out of the serving latency histograms.
+    def with_stage_prefix(self, stage_prefix):
+        return ModelBundle(self.model, self.scaler, self.version, stage_prefix)
+
+    def _scaled(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim == 1:
+            features = features.reshape(1, -1)
+        if self.scaler is not None:
+            with timer(f"{self.stage_prefix}scale"):
+                features = self.scaler.transform(features)
+        return features
+
+    # Probability of the diabetic class for raw (unscaled) feature rows
+    def predict_proba(self, features):
+        features = self._scaled(features)
+        with timer(f"{self.stage_prefix}predict"):
+            return self.model.predict_proba(features)[:, 1]
+
+    # Per-feature contributions to the log-odds, shape (rows, features + 1)
+    # with the bias last; each row sums to the margin. Exact TreeSHAP by
+    # default, or XGBoost's much cheaper path approximation (Saabas).
+    # Needs the XGBoost model, not a compiled .npz ensemble.
+    def contributions(self, features, approximate=False):
+        if not hasattr(self.model, "get_booster"):
+            raise TypeError("Feature contributions need the XGBoost model, not a compiled tree ensemble")
+        import xgboost as xgb
+
+        features = self._scaled(features)
+        with timer(f"{self.stage_prefix}contributions"):
+            return self.model.get_booster().predict(
+                xgb.DMatrix(features), pred_contribs=True, approx_contribs=approximate,
+            )
+
+
+# Loads the model and scaler once per process and hot-reloads them when a
+# new .sav file is dropped in place of the old one
+class ModelRegistry:
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, check_interval=CHECK_INTERVAL,
+                 stage_prefix=""):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.check_interval = check_interval
+        self.stage_prefix = stage_prefix
+        self._lock = threading.Lock()
+        self._bundle = None
+        self._signature = None
+        self._last_check = 0.0
+        self._listeners = []
+
+    # Call `callback(bundle)` whenever a new model version is swapped in
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    # Current bundle. Only one thread checks the files per interval; the
+    # rest get the current bundle without taking the lock.
+    def get(self):
+        bundle = self._bundle
+        if bundle is not None and time.monotonic() - self._last_check < self.check_interval:
+            return bundle
+
+        with self._lock:
+            if self._bundle is None or time.monotonic() - self._last_check >= self.check_interval:
+                self._refresh()
+            return self._bundle
+
+    # Force a reload check regardless of the check interval
+    def reload(self):
+        with self._lock:
+            self._refresh()
+            return self._bundle
+
+    def _artifact_paths(self):
+        return [self.model_path] if self.scaler_path is None else [self.model_path, self.scaler_path]
+
+    # False while a promote is half done: the model and scaler on disk do not
+    # both match the manifest (the last file to be swapped in). The current
+    # bundle is kept, and the signature is not recorded so the next check
+    # looks again. Artifacts without a manifest are always accepted.
+    def _matches_manifest(self, hashes):
+        manifest = _read_manifest(self.model_path)
+        if manifest is None:
+            return True
+        for path, digest in zip(self._artifact_paths(), hashes):
+            expected = manifest.get(os.path.basename(path))
+            if expected is not None and expected != digest:
+                if self._bundle is None:
+                    logger.warning("%s does not match %s; loading it anyway", path, MANIFEST_NAME)
+                    return True
+                logger.warning("%s does not match %s yet, keeping version %s",
+                               path, MANIFEST_NAME, self._bundle.version)
+                return False
+        return True
+
+    def _refresh(self):
+        self._last_check = time.monotonic()
+        try:
+            signature = tuple(_file_signature(path) for path in self._artifact_paths())
+        except OSError:
+            if self._bundle is None:
+                raise
+            logger.warning("Model artifacts missing, keeping version %s", self._bundle.version)
+            return
+
+        if signature == self._signature:
+            return
+
+        try:
+            hashes = [_file_hash(path) for path in self._artifact_paths()]
+            if not self._matches_manifest(hashes):
+                return
+            version = hashlib.sha256("".join(hashes).encode()).hexdigest()[:12]
+            if self._bundle is not None and version == self._bundle.version:
+                # Touched but unchanged, nothing to load
+                self._signature = signature
+                return
+            with timer(f"{self.stage_prefix}model_load"):
+                model = _load_model(self.model_path)
+                # A fused model already has the scaler folded into its thresholds
+                scaler = None
+                if self.scaler_path is not None and not getattr(model, "fused", False):
+                    scaler = _load_pickle(self.scaler_path)
+            bundle = ModelBundle(model, scaler, version, self.stage_prefix)
+            if tuple(_file_signature(path) for path in self._artifact_paths()) != signature:
+                # Replaced while loading: the pair may be mixed, try again next check
+                if self._bundle is not None:
+                    return
+        except Exception:
+            # A half-written file during a deploy must not take down serving
+            if self._bundle is None:
+                raise
+            logger.exception("Failed to reload model, keeping version %s", self._bundle.version)
+            return
+
+        # Swapping the reference is atomic; in-flight predictions keep the old bundle
+        self._bundle = bundle
+        self._signature = signature
+        logger.info("Loaded model version %s", version)
+        for callback in self._listeners:
+            callback(bundle)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+# Registry for a model artifact. A fused .npz (see tree_export.py --fuse)
+# needs no separate scaler.
+def create_registry(model_path, scaler_path=SCALER_PATH, stage_prefix=""):
+    if model_path.endswith(".npz"):
+        from tree_model import is_fused_artifact
+
+        if is_fused_artifact(model_path):
+            scaler_path = None
+    return ModelRegistry(model_path, scaler_path, stage_prefix=stage_prefix)
+
+
+# Process-wide registry shared by every Streamlit session. Set
+# DIASCAN_MODEL_PATH to diabetes_prediction_model.npz to serve without
+# xgboost, or to diabetes_prediction_fused.npz to also skip the scaler.
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = create_registry(os.environ.get("DIASCAN_MODEL_PATH", MODEL_PATH))
+    return _registry
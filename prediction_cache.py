@@ -0,0 +1,128 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import register_collector
+from model_registry import get_registry
+
+DEFAULT_MAXSIZE = 50_000
+DEFAULT_TTL = 6 * 60 * 60
+
+# Hashable cache key of an encoded feature vector. The values are kept
+# exactly (only -0.0 is folded into 0.0), so a hit returns what scoring
+# the same vector would: the cache never changes a result.
+def feature_key(features):
+    return tuple(float(value) + 0.0 for value in features)
+
+
+# Bounded LRU cache of encoded feature tuple -> probability, with a TTL.
+# Entries are tagged with the model version that produced them, and hold
+# the feature contributions once an explanation has been asked for.
+class PredictionCache:
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    # Live entry [version, probability, expires, contributions] or None
+    def _lookup(self, key, bundle, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == bundle.version and entry[2] > now:
+            self._entries.move_to_end(key)
+            return entry
+        return None
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # Cached probability for `features`, scoring with `bundle` on a miss
+    def predict(self, bundle, features):
+        key = feature_key(features)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._lookup(key, bundle, now)
+            if entry is not None:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Score outside the lock so concurrent misses do not serialize
+        probability = float(bundle.predict_proba(key)[0])
+        with self._lock:
+            self._store(key, [bundle.version, probability, now + self.ttl, None])
+        return probability
+
+    # Cached feature contributions (log-odds, bias last) for `features`,
+    # stored on the same entry as the probability
+    def explain(self, bundle, features):
+        key = feature_key(features)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._lookup(key, bundle, now)
+            if entry is not None and entry[3] is not None:
+                return entry[3]
+
+        contributions = tuple(float(value) for value in bundle.contributions(key)[0])
+        with self._lock:
+            entry = self._lookup(key, bundle, now)
+            if entry is None:
+                # The contributions sum to the margin, so the probability comes for free
+                probability = 1.0 / (1.0 + math.exp(-sum(contributions)))
+                entry = [bundle.version, probability, now + self.ttl, None]
+                self._store(key, entry)
+            entry[3] = contributions
+        return contributions
+
+    def clear(self, bundle=None):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+    # For metrics.prometheus_text
+    def prometheus_metrics(self):
+        stats = self.stats()
+        return {
+            "diascan_prediction_cache_hits_total": ("counter", "Predictions served from the cache.", stats["hits"]),
+            "diascan_prediction_cache_misses_total": ("counter", "Predictions that had to be scored.",
+                                                      stats["misses"]),
+            "diascan_prediction_cache_evictions_total": ("counter", "Entries dropped to stay within maxsize.",
+                                                         stats["evictions"]),
+            "diascan_prediction_cache_entries": ("gauge", "Entries currently cached.", stats["size"]),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Process-wide cache, emptied whenever the registry loads a new model
+def get_prediction_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = PredictionCache()
+                get_registry().add_listener(cache.clear)
+                register_collector("prediction_cache", cache.prometheus_metrics)
+                _cache = cache
+    return _cache
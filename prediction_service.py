@@ -0,0 +1,278 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from audit import close_audit_log, get_audit_log
+from drift import get_drift_monitor
+from features import SERVING_THRESHOLD
+from inference import encode_many, encode_one
+from metrics import prometheus_text, timer
+from model_registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH = 512
+
+
+# Collects feature rows from concurrent callers and scores them together,
+# so one vectorized predict_proba call serves a whole micro-batch
+class MicroBatcher:
+    def __init__(self, registry=None, window=DEFAULT_WINDOW_MS / 1000, max_batch=DEFAULT_MAX_BATCH):
+        self.registry = registry or get_registry()
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    # Queue rows (a 2-D list/array) for scoring. The future resolves to
+    # (probabilities, model_version).
+    def submit(self, rows):
+        future = Future()
+        self._queue.put((np.asarray(rows, dtype=np.float64), future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._score(batch)
+
+    def _score(self, batch):
+        try:
+            bundle = self.registry.get()
+            probabilities = bundle.predict_proba(np.vstack([rows for rows, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for rows, future in batch:
+            future.set_result((probabilities[offset:offset + len(rows)], bundle.version))
+            offset += len(rows)
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    # Keep-alive lets clients reuse connections between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY the
+    # body waits for the client's delayed ACK (~40 ms per request)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {
+                "status": "ok",
+                "model_version": self.server.batcher.registry.get().version,
+                "pid": os.getpid(),
+            })
+        elif self.path == "/metrics":
+            data = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    # POST /predict with either one record or {"instances": [record, ...]}
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            with timer("parse"):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                if "instances" in payload:
+                    rows = encode_many(payload["instances"])
+                else:
+                    rows = [encode_one(payload)]
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        # Queueing in the micro-batcher plus the batched predict
+        try:
+            with timer("batch_wait"):
+                probabilities, version = self.server.batcher.submit(rows).result()
+        except Exception:
+            logger.exception("Scoring failed")
+            self._send_json(500, {"error": "prediction failed"})
+            return
+        audit_log = get_audit_log()
+        if audit_log is not None:
+            audit_log.record(rows, probabilities, version, source="api")
+        drift_monitor = get_drift_monitor()
+        if drift_monitor is not None:
+            if "instances" in payload:
+                drift_monitor.update_many(rows)
+            else:
+                drift_monitor.update(rows[0])
+        threshold = self.server.threshold
+        predictions = [
+            {"probability": float(p), "prediction": int(p >= threshold)} for p in probabilities
+        ]
+        if "instances" in payload:
+            body = {"predictions": predictions, "model_version": version}
+        else:
+            body = dict(predictions[0], model_version=version)
+        self._send_json(200, body)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for bursts of concurrent connects
+    request_queue_size = 128
+
+    # `sock` is an already listening socket to serve on (pre-fork workers)
+    def __init__(self, address, batcher, threshold=SERVING_THRESHOLD, sock=None):
+        super().__init__(address, PredictionHandler, bind_and_activate=sock is None)
+        if sock is not None:
+            self.socket.close()
+            self.socket = sock
+            self.server_address = sock.getsockname()
+        self.batcher = batcher
+        self.threshold = threshold
+
+
+def create_server(host="127.0.0.1", port=8000, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+                  threshold=SERVING_THRESHOLD):
+    batcher = MicroBatcher(window=window_ms / 1000, max_batch=max_batch)
+    # Load the model before accepting traffic
+    batcher.registry.get()
+    return PredictionServer((host, port), batcher, threshold)
+
+
+# Load the model once and prepare it to be shared by forked workers:
+# compiled tree arrays move to shared memory, XGBoost scores on one thread
+# per worker, and the parent's objects are frozen out of the GC so workers
+# do not dirty (and copy) their pages
+def _prepare_shared_model(registry):
+    model = registry.get().model
+    if hasattr(model, "share"):
+        model.share()
+    elif hasattr(model, "get_booster"):
+        model.get_booster().set_param({"nthread": 1})
+    gc.freeze()
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _run_worker(sock, registry, window_ms, max_batch, threshold):
+    # Threads do not survive fork, so each worker starts its own batcher
+    batcher = MicroBatcher(registry, window=window_ms / 1000, max_batch=max_batch)
+    server = PredictionServer(None, batcher, threshold, sock=sock)
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # os._exit skips atexit, so flush queued audit records here,
+        # without letting a second SIGTERM cut the flush short
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        close_audit_log()
+        os._exit(0)
+
+
+# Pre-fork mode: the parent binds the socket and loads the model, then forks
+# `workers` processes that accept on the shared socket. A reload picked up
+# by one worker (a new artifact on disk) is loaded privately by that worker.
+def serve_prefork(host="127.0.0.1", port=8000, workers=4, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+                  threshold=SERVING_THRESHOLD):
+    registry = get_registry()
+    _prepare_shared_model(registry)
+    sock = socket.create_server((host, port), backlog=PredictionServer.request_queue_size)
+    print(f"Serving predictions on http://{host}:{sock.getsockname()[1]}/predict with {workers} workers",
+          flush=True)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(sock, registry, window_ms, max_batch, threshold)
+        children.append(pid)
+
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        for _ in children:
+            os.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON diabetes prediction service with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS,
+                        help="how long to wait for more requests before scoring a batch")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="maximum rows per batch")
+    parser.add_argument("--threshold", type=float, default=SERVING_THRESHOLD, help="decision threshold")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="pre-forked worker processes sharing one copy of the model")
+    args = parser.parse_args(argv)
+
+    if args.workers > 1:
+        serve_prefork(args.host, args.port, args.workers, args.window_ms, args.max_batch, args.threshold)
+        return
+
+    server = create_server(args.host, args.port, args.window_ms, args.max_batch, args.threshold)
+    print(f"Serving predictions on http://{args.host}:{server.server_address[1]}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from features import THRESHOLD
+
+DEFAULT_NEIGHBORS = 5
+DEFAULT_BATCH_SIZE = 8_192
+
+
+# k nearest minority neighbours of every minority row (self excluded),
+# using a KD/ball tree and parallel queries
+def minority_neighbors(X_minority, k=DEFAULT_NEIGHBORS, algorithm="kd_tree", n_jobs=-1):
+    from sklearn.neighbors import NearestNeighbors
+
+    nn = NearestNeighbors(n_neighbors=k + 1, algorithm=algorithm, n_jobs=n_jobs).fit(X_minority)
+    return nn.kneighbors(X_minority, return_distance=False)[:, 1:]
+
+
+# Yield synthetic minority rows in batches of at most batch_size, the same
+# way SMOTE builds them: x + gap * (neighbour - x). Only the minority rows
+# and their neighbour table are kept in memory. Pass `neighbors` to reuse
+# a table across passes; the same random_state gives the same rows.
+def iter_smote_batches(X_minority, n_samples, k=DEFAULT_NEIGHBORS, batch_size=DEFAULT_BATCH_SIZE, random_state=42,
+                       algorithm="kd_tree", n_jobs=-1, neighbors=None):
+    if neighbors is None:
+        neighbors = minority_neighbors(X_minority, k, algorithm, n_jobs)
+    rng = np.random.default_rng(random_state)
+    for start in range(0, n_samples, batch_size):
+        size = min(batch_size, n_samples - start)
+        rows = rng.integers(0, len(X_minority), size)
+        picks = neighbors[rows, rng.integers(0, neighbors.shape[1], size)]
+        gaps = rng.random((size, 1))
+        yield X_minority[rows] + gaps * (X_minority[picks] - X_minority[rows])
+
+
+# (minority class, synthetic rows needed to balance the classes)
+def _smote_plan(y):
+    classes, counts = np.unique(y, return_counts=True)
+    return classes[np.argmin(counts)], int(counts.max() - counts.min())
+
+
+# Drop-in for SMOTE(...).fit_resample on a binary problem: oversample the
+# minority class up to the majority count. Like imblearn it returns the
+# whole resampled matrix; fit_smote_streamed trains without building it.
+def smote_resample(X, y, k=DEFAULT_NEIGHBORS, random_state=42, algorithm="kd_tree", n_jobs=-1):
+    X = np.asarray(X)
+    y = np.asarray(y)
+    minority, n_samples = _smote_plan(y)
+    X_minority = X[y == minority]
+
+    X_out = np.empty((len(X) + n_samples, X.shape[1]), dtype=X.dtype)
+    X_out[:len(X)] = X
+    position = len(X)
+    for batch in iter_smote_batches(X_minority, n_samples, k, random_state=random_state, algorithm=algorithm,
+                                    n_jobs=n_jobs):
+        X_out[position:position + len(batch)] = batch
+        position += len(batch)
+    y_out = np.concatenate([y, np.full(n_samples, minority, dtype=y.dtype)])
+    return X_out, y_out
+
+
+# Fit an XGBClassifier on SMOTE-balanced data without materializing it:
+# the real rows and then freshly generated synthetic rows are fed to XGBoost
+# batch by batch through a DataIter, and only its quantized copy is kept
+# (about one byte per value instead of eight). Every pass regenerates the
+# same synthetic rows from random_state. Returns the fitted classifier.
+def fit_smote_streamed(classifier, X, y, k=DEFAULT_NEIGHBORS, batch_size=DEFAULT_BATCH_SIZE, random_state=42,
+                       algorithm="kd_tree", n_jobs=-1):
+    import xgboost as xgb
+
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    minority, n_samples = _smote_plan(y)
+    X_minority = X[y == minority]
+    neighbors = minority_neighbors(X_minority, k, algorithm, n_jobs)
+
+    class Batches(xgb.DataIter):
+        def __init__(self):
+            self._batches = None
+            super().__init__()
+
+        def _generate(self):
+            for start in range(0, len(X), batch_size):
+                yield X[start:start + batch_size], y[start:start + batch_size]
+            for batch in iter_smote_batches(X_minority, n_samples, k, batch_size, random_state,
+                                            neighbors=neighbors):
+                yield batch, np.full(len(batch), minority, dtype=y.dtype)
+
+        def reset(self):
+            self._batches = None
+
+        def next(self, input_data):
+            if self._batches is None:
+                self._batches = self._generate()
+            batch = next(self._batches, None)
+            if batch is None:
+                return False
+            input_data(data=batch[0], label=batch[1])
+            return True
+
+    params = classifier.get_xgb_params()
+    matrix = xgb.QuantileDMatrix(Batches(), max_bin=params.get("max_bin") or 256)
+    booster = xgb.train(params, matrix, num_boost_round=classifier.n_estimators or 100)
+    classifier.load_model(bytearray(booster.save_raw(raw_format="ubj")))
+    return classifier
+
+
+# Class-weight alternative to oversampling: XGBoost scale_pos_weight that
+# gives both classes the same total weight, with no extra rows at all
+def scale_pos_weight(y):
+    y = np.asarray(y)
+    positives = int(np.sum(y == 1))
+    return (len(y) - positives) / max(positives, 1)
+
+
+# Time, memory and recall of the notebook's SMOTE against the alternatives
+def benchmark(random_state=42):
+    import pandas as pd
+    import xgboost as xgb
+    from imblearn.over_sampling import SMOTE
+    from sklearn.metrics import precision_score, recall_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    from dataset import features_and_labels, load_dataset
+    from features import FEATURE_COLUMNS
+
+    X, y = features_and_labels(load_dataset())
+    X = StandardScaler().fit_transform(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=random_state)
+
+    methods = {
+        "imblearn SMOTE": lambda: SMOTE(random_state=random_state).fit_resample(X_train, y_train) + (1.0,),
+        "kd-tree SMOTE": lambda: smote_resample(X_train, y_train, random_state=random_state) + (1.0,),
+        "ball-tree SMOTE": lambda: smote_resample(X_train, y_train, random_state=random_state,
+                                                  algorithm="ball_tree") + (1.0,),
+        "scale_pos_weight": lambda: (X_train, y_train, scale_pos_weight(y_train)),
+    }
+    print(f"{'method':<18} {'resample_s':>10} {'peak_mb':>8} {'rows':>8} {'recall':>7} {'precision':>9}")
+    for name, method in methods.items():
+        tracemalloc.start()
+        start = time.perf_counter()
+        X_fit, y_fit, weight = method()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+        classifier = xgb.XGBClassifier(eval_metric="logloss", random_state=random_state, scale_pos_weight=weight)
+        classifier.fit(X_fit, y_fit)
+        prediction = (classifier.predict_proba(X_test)[:, 1] >= THRESHOLD).astype(int)
+        print(f"{name:<18} {elapsed:>10.2f} {peak:>8.1f} {len(y_fit):>8} "
+              f"{recall_score(y_test, prediction):>7.4f} {precision_score(y_test, prediction):>9.4f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Oversampling alternatives to in-memory SMOTE.")
+    parser.add_argument("--benchmark", action="store_true", help="compare against imblearn SMOTE")
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        benchmark()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
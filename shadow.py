@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from features import SERVING_THRESHOLD
+from metrics import register_collector
+from model_registry import BASE_DIR, SCALER_PATH, create_registry, get_registry
+
+logger = logging.getLogger(__name__)
+
+SHADOW_LOG_PATH = os.path.join(BASE_DIR, "shadow_log.jsonl")
+
+MAX_QUEUE = 10_000
+MAX_BATCH = 256
+
+
+# Per-row milliseconds of one predict_proba call over a batch
+def _timed_predict(bundle, X):
+    start = time.perf_counter()
+    probabilities = bundle.predict_proba(X)
+    return probabilities, (time.perf_counter() - start) * 1000 / len(X)
+
+
+# Scores live requests against a second "shadow" model on a background
+# thread. submit() never blocks the caller: when the queue is full the
+# request is dropped from the comparison (and counted). Latency is compared
+# by timing both models on the same batch, since the served latency
+# includes prediction cache hits.
+class ShadowEvaluator:
+    def __init__(self, registry, log_path=SHADOW_LOG_PATH, threshold=SERVING_THRESHOLD, max_queue=MAX_QUEUE,
+                 primary_registry=None):
+        self.registry = registry
+        self.primary_registry = primary_registry
+        self.log_path = log_path
+        self.threshold = threshold
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stats = {"compared": 0, "agreed": 0, "dropped": 0, "abs_diff_sum": 0.0, "latency_delta_ms_sum": 0.0}
+        self._thread = threading.Thread(target=self._run, name="shadow-evaluator", daemon=True)
+        self._thread.start()
+
+    # Queue one primary prediction for comparison
+    def submit(self, features, primary_probability, primary_version):
+        try:
+            self._queue.put_nowait((list(features), float(primary_probability), primary_version))
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        compared = stats.pop("compared")
+        return {
+            "compared": compared,
+            "dropped": stats["dropped"],
+            "agreement_rate": stats["agreed"] / compared if compared else None,
+            "mean_abs_diff": stats["abs_diff_sum"] / compared if compared else None,
+            "mean_latency_delta_ms": stats["latency_delta_ms_sum"] / compared if compared else None,
+        }
+
+    # For metrics.prometheus_text
+    def prometheus_metrics(self):
+        stats = self.stats()
+        return {
+            "diascan_shadow_compared_total": ("counter", "Requests scored by the shadow model.", stats["compared"]),
+            "diascan_shadow_dropped_total": ("counter", "Requests dropped because the shadow queue was full.",
+                                             stats["dropped"]),
+            "diascan_shadow_agreement_ratio": ("gauge", "Share of requests given the same label by both models.",
+                                               stats["agreement_rate"]),
+            "diascan_shadow_mean_abs_diff": ("gauge", "Mean absolute probability difference.",
+                                             stats["mean_abs_diff"]),
+            "diascan_shadow_mean_latency_delta_ms": ("gauge", "Mean shadow minus primary model latency per request.",
+                                                     stats["mean_latency_delta_ms"]),
+        }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._compare(batch)
+            except Exception:
+                logger.exception("Shadow evaluation failed for %d requests", len(batch))
+
+    def _compare(self, batch):
+        bundle = self.registry.get()
+        X = np.array([item[0] for item in batch], dtype=np.float64)
+        # Per-request model latency of both models, amortized over the batch
+        primary = (self.primary_registry or get_registry()).get()
+        _, primary_ms = _timed_predict(primary.with_stage_prefix("shadow_primary_"), X)
+        shadow, shadow_ms = _timed_predict(bundle, X)
+
+        agreed = abs_diff = 0.0
+        records = []
+        for (features, primary, primary_version), probability in zip(batch, shadow):
+            probability = float(probability)
+            agreed += (primary >= self.threshold) == (probability >= self.threshold)
+            abs_diff += abs(primary - probability)
+            records.append(json.dumps({
+                "timestamp": time.time(),
+                "features": features,
+                "primary_probability": primary,
+                "shadow_probability": probability,
+                "primary_version": primary_version,
+                "shadow_version": bundle.version,
+                "primary_ms": primary_ms,
+                "shadow_ms": shadow_ms,
+            }))
+
+        with open(self.log_path, "a") as f:
+            f.write("\n".join(records) + "\n")
+        with self._lock:
+            self._stats["compared"] += len(batch)
+            self._stats["agreed"] += int(agreed)
+            self._stats["abs_diff_sum"] += abs_diff
+            self._stats["latency_delta_ms_sum"] += (shadow_ms - primary_ms) * len(batch)
+
+
+_shadow = None
+_shadow_lock = threading.Lock()
+
+
+# Process-wide evaluator, or None when no shadow model is configured.
+# DIASCAN_SHADOW_MODEL points at the candidate model (.sav or .npz);
+# DIASCAN_SHADOW_SCALER and DIASCAN_SHADOW_LOG are optional.
+def get_shadow_evaluator():
+    global _shadow
+    model_path = os.environ.get("DIASCAN_SHADOW_MODEL")
+    if not model_path:
+        return None
+    if _shadow is None:
+        with _shadow_lock:
+            if _shadow is None:
+                registry = create_registry(model_path, os.environ.get("DIASCAN_SHADOW_SCALER", SCALER_PATH),
+                                           stage_prefix="shadow_")
+                _shadow = ShadowEvaluator(registry, os.environ.get("DIASCAN_SHADOW_LOG", SHADOW_LOG_PATH))
+                register_collector("shadow", _shadow.prometheus_metrics)
+    return _shadow
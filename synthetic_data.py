@@ -0,0 +1,44 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from model_registry import BASE_DIR
+
+DATASET_PATH = os.path.join(BASE_DIR, "diabetes_prediction_dataset.csv")
+
+
+# Write `scale` jittered copies of the source CSV. Each copy perturbs the
+# numeric columns slightly (age, BMI, HbA1c, glucose) so the rows survive
+# deduplication, while categoricals and labels are kept. Copies are written
+# one at a time, so memory stays at one copy of the source.
+def generate(output_path, scale=10, source_path=DATASET_PATH, random_state=42):
+    source = pd.read_csv(source_path)
+    rng = np.random.default_rng(random_state)
+    for copy in range(scale):
+        data = source.copy()
+        if copy > 0:
+            n = len(data)
+            data["age"] = np.clip(data["age"] + rng.integers(-2, 3, n), 0.08, 80).round(2)
+            data["bmi"] = np.clip(data["bmi"] + rng.normal(0, 0.5, n), 10, 95).round(2)
+            data["HbA1c_level"] = np.clip(data["HbA1c_level"] + rng.integers(-1, 2, n) * 0.1, 3.5, 9).round(1)
+            data["blood_glucose_level"] = np.clip(data["blood_glucose_level"] + rng.integers(-5, 6, n), 80, 300)
+        data.to_csv(output_path, mode="w" if copy == 0 else "a", header=copy == 0, index=False)
+    return len(source) * scale
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scale diabetes_prediction_dataset.csv up for load testing.")
+    parser.add_argument("output", help="CSV to write")
+    parser.add_argument("--scale", type=int, default=10, help="number of copies (e.g. 10 to 100)")
+    parser.add_argument("--source", default=DATASET_PATH)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rows = generate(args.output, args.scale, args.source, args.seed)
+    print(f"Wrote {rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from dataset import DigestSet, dedupe_chunk
+
+
+def _chunk(rows):
+    return pd.DataFrame(rows, columns=["gender", "age", "bmi"])
+
+
+def test_digest_set_membership():
+    seen = DigestSet()
+    seen.add(np.array([5, 1, 3], dtype=np.uint64))
+    seen.add(np.array([2], dtype=np.uint64))
+    found = seen.contains(np.array([1, 2, 4, 5], dtype=np.uint64))
+    assert found.tolist() == [True, True, False, True]
+    assert len(seen) == 4
+
+
+def test_all_duplicate_chunk():
+    seen = DigestSet()
+    first = _chunk([[0, 50.0, 27.3], [1, 61.0, 31.2]])
+    kept, _ = dedupe_chunk(first, seen)
+    assert len(kept) == 2
+
+    # Every row was seen before: nothing is kept or added...
+    kept, digests = dedupe_chunk(first.copy(), seen)
+    assert len(kept) == 0 and len(digests) == 0
+    assert len(seen) == 2
+
+    # ...and later chunks are still checked against the earlier rows
+    kept, _ = dedupe_chunk(_chunk([[1, 61.0, 31.2], [0, 44.0, 22.1]]), seen)
+    assert kept.to_numpy().tolist() == [[0, 44.0, 22.1]]
+
+
+def test_empty_run_is_never_stored():
+    seen = DigestSet()
+    seen.add(np.array([], dtype=np.uint64))
+    assert seen.contains(np.array([7], dtype=np.uint64)).tolist() == [False]
@@ -0,0 +1,359 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import resource
+import shutil
+import time
+import tracemalloc
+
+import numpy as np
+
+from features import FEATURE_COLUMNS, THRESHOLD
+from model_registry import BASE_DIR, MANIFEST_NAME, _file_hash, _save_pickle
+
+DATASET_PATH = os.path.join(BASE_DIR, "diabetes_prediction_dataset.csv")
+CACHE_DIR = os.path.join(BASE_DIR, ".pipeline_cache")
+# Exports land here; promote() moves them next to the served files. It must
+# be on the same filesystem as BASE_DIR for the renames to be atomic.
+STAGING_DIR = os.path.join(BASE_DIR, "staging")
+# Everything export writes besides the manifest, in the order promote()
+# moves it
+EXPORT_FILES = (
+    "diabetes_prediction_model.npz",
+    "diabetes_prediction_fused.npz",
+    "drift_reference.json",
+    "diabetes_prediction_scaler.sav",
+    "diabetes_prediction_model.sav",
+)
+
+# Same constants as the notebook
+DEFAULT_CONFIG = {
+    "dataset": DATASET_PATH,
+    "test_size": 0.2,
+    "threshold": THRESHOLD,
+    "random_state": 42,
+    "resample_method": "smote",
+    "xgb_params": {"eval_metric": "logloss", "random_state": 42},
+    "export_dir": STAGING_DIR,
+}
+
+
+# ----- Stages -----
+# Each stage takes the outputs of earlier stages and the config, and returns
+# a dict of outputs. NumPy arrays are stored as .npz, everything else pickled.
+
+def load(inputs, config):
+    from dataset import read_dataset
+
+    return {"data": read_dataset(config["dataset"])}
+
+
+def dedupe(inputs, config):
+    return {"data": inputs["data"].drop_duplicates()}
+
+
+def encode(inputs, config):
+    from dataset import features_and_labels
+
+    # Categoricals are already coded at parse time; this only assembles the matrix
+    X, y = features_and_labels(inputs["data"])
+    return {"X": X, "y": y}
+
+
+def scale(inputs, config):
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+
+    # Fitted on a DataFrame, like the notebook, so the scaler keeps feature names
+    scaler = StandardScaler()
+    X = scaler.fit_transform(pd.DataFrame(inputs["X"], columns=FEATURE_COLUMNS))
+    return {"X": X, "scaler": scaler}
+
+
+def split(inputs, config):
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        inputs["X"], inputs["y"], test_size=config["test_size"], stratify=inputs["y"],
+        random_state=config["random_state"],
+    )
+    return {"X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test}
+
+
+# resample_method: "smote" (imblearn, as in the notebook), "kd_smote" (the
+# KD-tree SMOTE in resampling.py, generated batch by batch during fit, so
+# the oversampled matrix never exists) or "weight" (no resampling,
+# scale_pos_weight)
+def resample(inputs, config):
+    import resampling
+
+    X_train, y_train = inputs["X_train"], inputs["y_train"]
+    method = config["resample_method"]
+    outputs = {"scale_pos_weight": 1.0, "stream_smote": False}
+    if method == "smote":
+        from imblearn.over_sampling import SMOTE
+
+        X_train, y_train = SMOTE(random_state=config["random_state"]).fit_resample(X_train, y_train)
+    elif method == "kd_smote":
+        outputs["stream_smote"] = True
+    elif method == "weight":
+        outputs["scale_pos_weight"] = resampling.scale_pos_weight(y_train)
+    else:
+        raise ValueError(f"Unknown resample_method {method!r}")
+    return dict(outputs, X_train=X_train, y_train=y_train)
+
+
+def fit(inputs, config):
+    import xgboost as xgb
+
+    params = dict(config["xgb_params"])
+    if inputs["scale_pos_weight"] != 1.0:
+        params.setdefault("scale_pos_weight", inputs["scale_pos_weight"])
+    classifier = xgb.XGBClassifier(**params)
+    if inputs["stream_smote"]:
+        from resampling import fit_smote_streamed
+
+        fit_smote_streamed(classifier, inputs["X_train"], inputs["y_train"], random_state=config["random_state"])
+    else:
+        classifier.fit(inputs["X_train"], inputs["y_train"])
+    return {"classifier": classifier}
+
+
+def evaluate(inputs, config):
+    from sklearn.metrics import accuracy_score, confusion_matrix, precision_score, recall_score, roc_auc_score
+
+    y_test = inputs["y_test"]
+    proba = inputs["classifier"].predict_proba(inputs["X_test"])[:, 1]
+    prediction = (proba >= config["threshold"]).astype(int)
+    metrics = {
+        "accuracy": accuracy_score(y_test, prediction),
+        "precision": precision_score(y_test, prediction),
+        "recall": recall_score(y_test, prediction),
+        "roc_auc": roc_auc_score(y_test, proba),
+        "confusion_matrix": confusion_matrix(y_test, prediction).tolist(),
+    }
+    return {"metrics": metrics}
+
+
+def reference(inputs, config):
+    from drift import build_reference
+
+    # Sketches of the unscaled training inputs, for the serving drift monitor
+    return {"reference": build_reference(inputs["X"])}
+
+
+def _save_ensemble(ensemble, path):
+    tmp = path + ".tmp.npz"
+    ensemble.save(tmp)
+    os.replace(tmp, path)
+
+
+# Writes the full set of serving artifacts, so the compiled .npz models and
+# the drift reference always match the pickles they sit next to
+def export(inputs, config):
+    from drift import save_reference
+    from tree_export import export_booster
+
+    export_dir = config["export_dir"]
+    os.makedirs(export_dir, exist_ok=True)
+    classifier, scaler = inputs["classifier"], inputs["scaler"]
+    ensemble = export_booster(classifier.get_booster())
+    _save_ensemble(ensemble, os.path.join(export_dir, "diabetes_prediction_model.npz"))
+    _save_ensemble(ensemble.fold_scaler(scaler.mean_, scaler.scale_),
+                   os.path.join(export_dir, "diabetes_prediction_fused.npz"))
+    save_reference(inputs["reference"], os.path.join(export_dir, "drift_reference.json"))
+    _save_pickle(scaler, os.path.join(export_dir, "diabetes_prediction_scaler.sav"))
+    _save_pickle(classifier, os.path.join(export_dir, "diabetes_prediction_model.sav"))
+    write_manifest(export_dir, EXPORT_FILES)
+    return {}
+
+
+# Record the content hash of each exported file, for the registry to check
+# a promoted set against
+def write_manifest(export_dir, names):
+    path = os.path.join(export_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"files": {name: _file_hash(os.path.join(export_dir, name)) for name in names}}, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+# Move an exported artifact set into the serving directory. Each file is
+# swapped in with one rename, so the registry never loads a partial file,
+# and the manifest goes last: until it lands the registry sees artifacts
+# that do not match it and keeps serving the previous pair.
+def promote(export_dir=STAGING_DIR, target_dir=BASE_DIR, names=EXPORT_FILES):
+    for name in list(names) + [MANIFEST_NAME]:
+        os.replace(os.path.join(export_dir, name), os.path.join(target_dir, name))
+
+
+# (name, function, config keys it depends on, {input name: (stage, output)})
+STAGES = [
+    ("load", load, ["dataset"], {}),
+    ("dedupe", dedupe, [], {"data": ("load", "data")}),
+    ("encode", encode, [], {"data": ("dedupe", "data")}),
+    ("scale", scale, [], {"X": ("encode", "X")}),
+    ("split", split, ["test_size", "random_state"], {"X": ("scale", "X"), "y": ("encode", "y")}),
+    ("resample", resample, ["random_state", "resample_method"],
+     {"X_train": ("split", "X_train"), "y_train": ("split", "y_train")}),
+    ("fit", fit, ["xgb_params", "random_state"],
+     {"X_train": ("resample", "X_train"), "y_train": ("resample", "y_train"),
+      "scale_pos_weight": ("resample", "scale_pos_weight"), "stream_smote": ("resample", "stream_smote")}),
+    ("evaluate", evaluate, ["threshold"],
+     {"classifier": ("fit", "classifier"), "X_test": ("split", "X_test"), "y_test": ("split", "y_test")}),
+    ("reference", reference, [], {"X": ("encode", "X")}),
+    ("export", export, ["export_dir"],
+     {"classifier": ("fit", "classifier"), "scaler": ("scale", "scaler"), "reference": ("reference", "reference")}),
+]
+
+# Stages with side effects always run
+UNCACHED_STAGES = {"export"}
+
+# Repo modules whose code a stage calls into. Their source is part of the
+# stage key, so editing the dataset schema or the SMOTE helper invalidates
+# the cached outputs built with the old code.
+STAGE_MODULES = {
+    "load": ["dataset", "features"],
+    "encode": ["dataset", "features"],
+    "resample": ["resampling"],
+    "fit": ["resampling"],
+    "reference": ["drift", "features"],
+}
+
+
+# ----- Artifact store -----
+
+def _save_outputs(path, outputs):
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    arrays = {k: v for k, v in outputs.items() if isinstance(v, np.ndarray)}
+    objects = {k: v for k, v in outputs.items() if k not in arrays}
+    np.savez(os.path.join(tmp, "arrays.npz"), **arrays)
+    with open(os.path.join(tmp, "objects.pkl"), "wb") as f:
+        pickle.dump(objects, f)
+    # Rename last, so an interrupted run never leaves a half-written artifact
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp, path)
+
+
+def _load_outputs(path):
+    with np.load(os.path.join(path, "arrays.npz"), allow_pickle=False) as data:
+        outputs = {k: data[k] for k in data.files}
+    with open(os.path.join(path, "objects.pkl"), "rb") as f:
+        outputs.update(pickle.load(f))
+    return outputs
+
+
+# Content hash of each stage: its code and that of the modules it uses, its
+# config, the hashes of its upstream stages and, for the load stage, the
+# dataset bytes
+def stage_keys(config):
+    keys = {}
+    for name, function, config_keys, stage_inputs in STAGES:
+        parts = {
+            "stage": name,
+            "code": hashlib.sha256(inspect.getsource(function).encode()).hexdigest(),
+            "modules": {module: _file_hash(os.path.join(BASE_DIR, f"{module}.py"))
+                        for module in STAGE_MODULES.get(name, [])},
+            "config": {k: config[k] for k in config_keys},
+            "inputs": sorted({keys[stage] for stage, _ in stage_inputs.values()}),
+        }
+        if name == "load":
+            parts["dataset_hash"] = _file_hash(config["dataset"])
+        keys[name] = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+    return keys
+
+
+def _max_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Run every stage, recomputing only those whose key changed. Returns the
+# outputs of the final stages that were needed, plus per-stage timings.
+def run_pipeline(config, cache_dir=CACHE_DIR, force=False):
+    os.makedirs(cache_dir, exist_ok=True)
+    keys = stage_keys(config)
+    outputs = {}
+    report = []
+
+    def stage_outputs(stage):
+        if stage not in outputs:
+            outputs[stage] = _load_outputs(os.path.join(cache_dir, f"{stage}-{keys[stage]}"))
+        return outputs[stage]
+
+    for name, function, _, stage_inputs in STAGES:
+        path = os.path.join(cache_dir, f"{name}-{keys[name]}")
+        if not force and name not in UNCACHED_STAGES and os.path.isdir(path):
+            report.append((name, keys[name], "cached", 0.0, 0.0, _max_rss_mb()))
+            continue
+
+        inputs = {k: stage_outputs(stage)[output] for k, (stage, output) in stage_inputs.items()}
+        tracemalloc.start()
+        start = time.perf_counter()
+        outputs[name] = function(inputs, config)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        if name not in UNCACHED_STAGES:
+            _save_outputs(path, outputs[name])
+        report.append((name, keys[name], "ran", elapsed, peak, _max_rss_mb()))
+
+    return stage_outputs("evaluate")["metrics"], report
+
+
+def print_report(report):
+    print(f"{'stage':<10} {'key':<17} {'status':<7} {'wall_s':>8} {'peak_mb':>9} {'max_rss_mb':>11}")
+    for name, key, status, elapsed, peak, rss in report:
+        print(f"{name:<10} {key:<17} {status:<7} {elapsed:>8.2f} {peak:>9.1f} {rss:>11.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the diabetes model with cached, content-hashed stages.")
+    parser.add_argument("--dataset", default=DEFAULT_CONFIG["dataset"])
+    parser.add_argument("--test-size", type=float, default=DEFAULT_CONFIG["test_size"])
+    parser.add_argument("--threshold", type=float, default=DEFAULT_CONFIG["threshold"])
+    parser.add_argument("--random-state", type=int, default=DEFAULT_CONFIG["random_state"])
+    parser.add_argument("--resample-method", choices=["smote", "kd_smote", "weight"],
+                        default=DEFAULT_CONFIG["resample_method"], help="how the minority class is balanced")
+    parser.add_argument("--xgb-param", action="append", default=[], metavar="KEY=VALUE",
+                        help="XGBClassifier parameter (JSON value), may be repeated")
+    parser.add_argument("--export-dir", default=DEFAULT_CONFIG["export_dir"],
+                        help="where to write the model artifacts (default: a staging directory)")
+    parser.add_argument("--promote", action="store_true",
+                        help="after exporting, move the artifacts into place for serving")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="ignore cached stage artifacts")
+    args = parser.parse_args(argv)
+
+    xgb_params = dict(DEFAULT_CONFIG["xgb_params"])
+    for item in args.xgb_param:
+        key, _, value = item.partition("=")
+        try:
+            xgb_params[key] = json.loads(value)
+        except json.JSONDecodeError:
+            xgb_params[key] = value
+
+    config = {
+        "dataset": os.path.abspath(args.dataset),
+        "test_size": args.test_size,
+        "threshold": args.threshold,
+        "random_state": args.random_state,
+        "resample_method": args.resample_method,
+        "xgb_params": xgb_params,
+        "export_dir": os.path.abspath(args.export_dir),
+    }
+    metrics, report = run_pipeline(config, args.cache_dir, args.force)
+    print_report(report)
+    for name, value in metrics.items():
+        print(f"{name}: {value}")
+    if args.promote:
+        promote(config["export_dir"])
+        print(f"Promoted {config['export_dir']} to {BASE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from features import THRESHOLD
+from model_registry import BASE_DIR, MODEL_PATH, SCALER_PATH, _load_pickle
+from tree_model import TreeEnsemble
+
+COMPILED_MODEL_PATH = os.path.join(BASE_DIR, "diabetes_prediction_model.npz")
+FUSED_MODEL_PATH = os.path.join(BASE_DIR, "diabetes_prediction_fused.npz")
+DATASET_PATH = os.path.join(BASE_DIR, "diabetes_prediction_dataset.csv")
+
+# Maximum allowed |p_exported - p_xgboost| in the parity check
+PARITY_TOLERANCE = 1e-5
+
+
+def _parse_base_score(value):
+    return float(str(value).strip("[]"))
+
+
+def _tree_depth(left, right):
+    depth = 0
+    level = [0]
+    while level:
+        level = [child for node in level for child in (left[node], right[node]) if child != -1]
+        depth += bool(level)
+    return depth
+
+
+# Convert a fitted binary:logistic booster into a TreeEnsemble
+def export_booster(booster):
+    learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+    objective = learner["objective"]["name"]
+    if objective != "binary:logistic":
+        raise ValueError(f"Only binary:logistic models can be exported, got {objective}")
+
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    for tree in learner["gradient_booster"]["model"]["trees"]:
+        offset = len(feature)
+        tree_left, tree_right = tree["left_children"], tree["right_children"]
+        if any(tree.get("split_type", [])):
+            raise ValueError("Categorical splits are not supported")
+        roots.append(offset)
+        max_depth = max(max_depth, _tree_depth(tree_left, tree_right))
+        for node, (l, r) in enumerate(zip(tree_left, tree_right)):
+            leaf = l == -1
+            feature.append(0 if leaf else tree["split_indices"][node])
+            # For leaves, split_conditions holds the leaf value
+            threshold.append(0.0 if leaf else tree["split_conditions"][node])
+            value.append(tree["split_conditions"][node] if leaf else 0.0)
+            left.append(offset + node if leaf else offset + l)
+            right.append(offset + node if leaf else offset + r)
+            default_left.append(bool(tree["default_left"][node]))
+
+    base_score = _parse_base_score(learner["learner_model_param"]["base_score"])
+    return TreeEnsemble(
+        feature=feature,
+        threshold=np.asarray(threshold, dtype=np.float32),
+        left=left,
+        right=right,
+        default_left=default_left,
+        value=value,
+        roots=roots,
+        base_margin=math.log(base_score / (1.0 - base_score)),
+        max_depth=max_depth,
+        n_features=int(learner["learner_model_param"]["num_feature"]),
+    )
+
+
+# Encoded, unscaled feature matrix of the shipped dataset
+def _load_raw_dataset():
+    import pandas as pd
+
+    from inference import encode_many
+
+    return encode_many(pd.read_csv(DATASET_PATH), errors="coerce")
+
+
+# Compare the exported ensemble with the pickled scaler + XGBoost pipeline
+def check_parity(expected, actual, tolerance=PARITY_TOLERANCE):
+    max_diff = float(np.max(np.abs(expected - actual)))
+    flipped = int(np.sum((expected >= THRESHOLD) != (actual >= THRESHOLD)))
+    print(f"Parity over {len(expected)} rows: max |diff| = {max_diff:.2e} (tolerance {tolerance:.0e}), "
+          f"{flipped} labels differ at threshold {THRESHOLD}")
+    return max_diff <= tolerance
+
+
+def _time(fn, X, min_time=0.5):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn(X)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+# Scaler + native XGBoost vs the exported ensemble, end to end from raw features
+def benchmark(reference, exported, X):
+    print(f"{'rows':>8} {'xgboost_ms':>11} {'numpy_ms':>9}")
+    for rows in (1, 100, 10_000, len(X)):
+        batch = X[:rows]
+        native = _time(reference, batch) * 1000
+        compiled = _time(exported, batch) * 1000
+        print(f"{rows:>8} {native:>11.3f} {compiled:>9.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the XGBoost model to a NumPy tree ensemble.")
+    parser.add_argument("--model", default=MODEL_PATH, help="pickled XGBClassifier")
+    parser.add_argument("--scaler", default=SCALER_PATH, help="pickled StandardScaler")
+    parser.add_argument("--output", help="where to write the .npz artifact")
+    parser.add_argument("--fuse", action="store_true",
+                        help="fold the scaler into the thresholds so the artifact takes raw features")
+    parser.add_argument("--check", action="store_true", help="verify parity with the two-step pipeline")
+    parser.add_argument("--benchmark", action="store_true", help="time native XGBoost against NumPy")
+    args = parser.parse_args(argv)
+
+    # The scaler was fitted on a DataFrame; plain arrays are fine here
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    model = _load_pickle(args.model)
+    scaler = _load_pickle(args.scaler)
+    ensemble = export_booster(model.get_booster())
+    if args.fuse:
+        ensemble = ensemble.fold_scaler(scaler.mean_, scaler.scale_)
+    output = args.output or (FUSED_MODEL_PATH if args.fuse else COMPILED_MODEL_PATH)
+    ensemble.save(output)
+    print(f"Wrote {len(ensemble.roots)} trees ({len(ensemble.feature)} nodes) to {output}")
+
+    if args.check or args.benchmark:
+        X = _load_raw_dataset()
+
+        def reference(X):
+            return model.predict_proba(scaler.transform(X))[:, 1]
+
+        def exported(X):
+            return ensemble.predict_proba(X if ensemble.fused else scaler.transform(X))[:, 1]
+
+        if args.check and not check_parity(reference(X), exported(X)):
+            sys.exit(1)
+        if args.benchmark:
+            benchmark(reference, exported, X)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import mmap
+
+import numpy as np
+
+# Rows evaluated per block, bounding the (rows x trees) index arrays
+BLOCK_SIZE = 8_192
+
+
+# Array-based copy of a binary:logistic XGBoost tree ensemble that scores
+# batches with NumPy alone. All trees share flat node arrays; leaves point
+# to themselves, so every row can walk every tree for max_depth steps
+# without checking whether it already reached a leaf.
+class TreeEnsemble:
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, base_margin, max_depth,
+                 n_features, fused=False):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float32)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.base_margin = float(base_margin)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        # True when a StandardScaler has been folded in and inputs are raw features
+        self.fused = bool(fused)
+        # children[2 * i + go_left] is the next node after node i
+        self._children = np.empty(2 * len(self.feature), dtype=np.intp)
+        self._children[0::2] = self.right
+        self._children[1::2] = self.left
+        self._feature = self.feature.astype(np.intp)
+        self._roots = self.roots.astype(np.intp)
+
+    # Raw margin (log-odds) for each row of X
+    def predict_margin(self, X):
+        # Inputs are compared at the precision of the thresholds, as XGBoost does with float32
+        X = np.asarray(X, dtype=self.threshold.dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+
+        margin = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), BLOCK_SIZE):
+            block = X[start:start + BLOCK_SIZE]
+            n = len(block)
+            # Feature-major copy, so x[row, f] is flat[f * n + row]
+            flat = np.ascontiguousarray(block.T).ravel()
+            rows = np.arange(n, dtype=np.intp)[:, None]
+            has_missing = np.isnan(flat).any()
+            node = np.broadcast_to(self._roots, (n, len(self._roots))).copy()
+            for _ in range(self.max_depth):
+                x = flat[self._feature[node] * n + rows]
+                go_left = x < self.threshold[node]
+                if has_missing:
+                    go_left = np.where(np.isnan(x), self.default_left[node], go_left)
+                node = self._children[2 * node + go_left]
+            margin[start:start + n] = self.value[node].sum(axis=1, dtype=np.float32)
+        return margin + self.base_margin
+
+    # Same shape as XGBClassifier.predict_proba: [P(non-diabetic), P(diabetic)]
+    def predict_proba(self, X):
+        positive = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - positive, positive])
+
+    # Copy of this ensemble that takes raw features, with a StandardScaler
+    # folded into the thresholds (see _fold_thresholds)
+    def fold_scaler(self, mean, scale):
+        if self.fused:
+            raise ValueError("Ensemble already has a scaler folded in")
+        mean = np.zeros(self.n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones(self.n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+        threshold = _fold_thresholds(self.threshold, mean[self.feature], scale[self.feature])
+        return TreeEnsemble(
+            self.feature, threshold, self.left, self.right, self.default_left, self.value, self.roots,
+            self.base_margin, self.max_depth, self.n_features, fused=True,
+        )
+
+    # Move the node arrays into one anonymous shared mapping. Processes
+    # forked afterwards map the same physical pages, so N workers hold one
+    # copy of the trees. The arrays become read-only.
+    def share(self):
+        names = ["feature", "threshold", "left", "right", "default_left", "value", "roots",
+                 "_children", "_feature", "_roots"]
+        offsets = []
+        size = 0
+        for name in names:
+            size = -(-size // 64) * 64
+            offsets.append(size)
+            size += getattr(self, name).nbytes
+        buffer = mmap.mmap(-1, max(size, 1))
+        for name, offset in zip(names, offsets):
+            array = getattr(self, name)
+            shared = np.ndarray(array.shape, array.dtype, buffer=buffer, offset=offset)
+            shared[...] = array
+            shared.flags.writeable = False
+            setattr(self, name, shared)
+        self._shared_buffer = buffer
+        return self
+
+    def save(self, path):
+        np.savez(
+            path,
+            feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            default_left=self.default_left, value=self.value, roots=self.roots,
+            base_margin=self.base_margin, max_depth=self.max_depth, n_features=self.n_features,
+            fused=self.fused,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+
+# Raw-space thresholds t such that x < t exactly when
+# float32((x - mean) / scale) < threshold, which is how the scaler + XGBoost
+# pipeline decides a split. Algebraically t = threshold * scale + mean, but
+# split points are data values, so many inputs land exactly on them and the
+# float rounding has to agree; bisection over float64 finds the exact cut.
+def _fold_thresholds(threshold, mean, scale):
+    threshold = np.asarray(threshold, dtype=np.float32)
+
+    def goes_right(x):
+        return ((x - mean) / scale).astype(np.float32) >= threshold
+
+    guess = threshold.astype(np.float64) * scale + mean
+    step = np.abs(guess) * 1e-6 + scale * 1e-6
+    low, high = guess - step, guess + step
+    while True:
+        bad_low, bad_high = goes_right(low), ~goes_right(high)
+        if not (bad_low.any() or bad_high.any()):
+            break
+        step *= 2
+        low = np.where(bad_low, guess - step, low)
+        high = np.where(bad_high, guess + step, high)
+
+    # Invariant: low goes left, high goes right; stop once they are adjacent doubles
+    while True:
+        middle = low + (high - low) / 2
+        active = (middle != low) & (middle != high)
+        if not active.any():
+            return high
+        right = goes_right(middle)
+        high = np.where(active & right, middle, high)
+        low = np.where(active & ~right, middle, low)
+
+
+# Whether the .npz at `path` is a fused artifact that replaces the scaler
+def is_fused_artifact(path):
+    with np.load(path) as data:
+        return "fused" in data.files and bool(data["fused"])
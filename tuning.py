@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from model_registry import BASE_DIR, _file_hash
+
+RESULTS_PATH = os.path.join(BASE_DIR, "tuning_results.jsonl")
+
+# Search space sampled by each trial. n_estimators is only an upper bound;
+# early stopping on a slice of each training fold picks the actual number
+# of rounds.
+SEARCH_SPACE = {
+    "max_depth": [3, 4, 5, 6, 8],
+    "learning_rate": [0.03, 0.05, 0.1, 0.2, 0.3],
+    "min_child_weight": [1, 3, 5],
+    "subsample": [0.7, 0.85, 1.0],
+    "colsample_bytree": [0.7, 0.85, 1.0],
+    "sampler": ["smote", "adasyn"],
+}
+MAX_ESTIMATORS = 1000
+EARLY_STOPPING_ROUNDS = 50
+# Share of each training fold held back (before resampling) to drive early
+# stopping, so the validation fold is only ever used for scoring
+EARLY_STOPPING_FRACTION = 0.1
+
+_data = {}
+
+
+# Training split used for the search: same preprocessing and hold-out split
+# as the training pipeline, so the test set is never seen while tuning
+def load_training_data(test_size=0.2, random_state=42):
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    from dataset import features_and_labels, load_dataset
+
+    X, y = features_and_labels(load_dataset())
+    X = StandardScaler().fit_transform(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=test_size, stratify=y, random_state=random_state)
+    return X_train, y_train
+
+
+# Everything besides the parameters that a trial's result depends on
+def search_settings(folds, seed, beta, test_size=0.2):
+    from dataset import DATASET_PATH, SCHEMA_HASH
+
+    return {
+        "folds": folds,
+        "seed": seed,
+        "beta": beta,
+        "test_size": test_size,
+        "early_stopping_fraction": EARLY_STOPPING_FRACTION,
+        "dataset_hash": _file_hash(DATASET_PATH),
+        "schema_hash": SCHEMA_HASH,
+    }
+
+
+def trial_id(params, settings):
+    return hashlib.sha256(json.dumps([params, settings], sort_keys=True).encode()).hexdigest()[:12]
+
+
+# n_trials distinct parameter sets (fewer if the space is smaller). The
+# draws are deterministic, so a longer search extends a shorter one.
+def sample_trials(n_trials, seed):
+    rng = random.Random(seed)
+    space_size = int(np.prod([len(values) for values in SEARCH_SPACE.values()]))
+    trials, seen = [], set()
+    while len(trials) < min(n_trials, space_size):
+        params = {name: rng.choice(values) for name, values in SEARCH_SPACE.items()}
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            trials.append(params)
+    return trials
+
+
+# Threshold on the precision-recall curve that maximizes F-beta
+def best_threshold(y_true, proba, beta):
+    from sklearn.metrics import precision_recall_curve
+
+    precision, recall, thresholds = precision_recall_curve(y_true, proba)
+    precision, recall = precision[:-1], recall[:-1]
+    beta2 = beta * beta
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fbeta = np.nan_to_num((1 + beta2) * precision * recall / (beta2 * precision + recall))
+    best = int(np.argmax(fbeta))
+    return float(thresholds[best]), float(precision[best]), float(recall[best]), float(fbeta[best])
+
+
+def _init_worker(X, y):
+    _data["X"], _data["y"] = X, y
+
+
+# Stratified k-fold for one parameter set. Each training fold is split
+# into a fitting part, resampled on its own, and an early-stopping part;
+# the held-out fold only provides the out-of-fold probabilities the
+# threshold is chosen from.
+def run_trial(params, settings):
+    import xgboost as xgb
+    from imblearn.over_sampling import ADASYN, SMOTE
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import StratifiedKFold, train_test_split
+
+    X, y = _data["X"], _data["y"]
+    start = time.perf_counter()
+    xgb_params = {k: v for k, v in params.items() if k != "sampler"}
+    sampler_class = SMOTE if params["sampler"] == "smote" else ADASYN
+
+    seed, beta = settings["seed"], settings["beta"]
+    oof = np.empty(len(y))
+    rounds = []
+    for train_index, val_index in StratifiedKFold(settings["folds"], shuffle=True, random_state=seed).split(X, y):
+        fit_index, stop_index = train_test_split(
+            train_index, test_size=settings["early_stopping_fraction"], stratify=y[train_index], random_state=seed,
+        )
+        X_fit, y_fit = sampler_class(random_state=seed).fit_resample(X[fit_index], y[fit_index])
+        classifier = xgb.XGBClassifier(
+            n_estimators=MAX_ESTIMATORS, early_stopping_rounds=EARLY_STOPPING_ROUNDS, eval_metric="logloss",
+            n_jobs=1, random_state=seed, **xgb_params,
+        )
+        classifier.fit(X_fit, y_fit, eval_set=[(X[stop_index], y[stop_index])], verbose=False)
+        oof[val_index] = classifier.predict_proba(X[val_index])[:, 1]
+        rounds.append(int(classifier.best_iteration) + 1)
+
+    threshold, precision, recall, fbeta = best_threshold(y, oof, beta)
+    return {
+        "id": trial_id(params, settings),
+        "params": params,
+        "settings": settings,
+        "n_estimators": int(np.median(rounds)),
+        "threshold": threshold,
+        "precision": precision,
+        "recall": recall,
+        "fbeta": fbeta,
+        "beta": beta,
+        "roc_auc": float(roc_auc_score(y, oof)),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Run the trials not already in the results store, appending each result
+# as it finishes so an interrupted search resumes where it stopped. Trials
+# run under other settings (beta, folds, split, dataset) are not reused.
+def search(n_trials=20, folds=5, seed=42, beta=1.0, workers=None, results_path=RESULTS_PATH, test_size=0.2):
+    settings = search_settings(folds, seed, beta, test_size)
+    done = {result["id"] for result in load_results(results_path)}
+    pending = [p for p in sample_trials(n_trials, seed) if trial_id(p, settings) not in done]
+    print(f"{len(done)} trials in {results_path}, {len(pending)} to run")
+    if not pending:
+        return load_results(results_path)
+
+    X, y = load_training_data(test_size=test_size, random_state=seed)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y)) as pool:
+        futures = [pool.submit(run_trial, params, settings) for params in pending]
+        with open(results_path, "a") as f:
+            for completed, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+                rate = completed / (time.perf_counter() - start) * 60
+                print(f"[{completed}/{len(pending)}] F{beta:g}={result['fbeta']:.4f} "
+                      f"P={result['precision']:.4f} R={result['recall']:.4f} @ {result['threshold']:.3f} "
+                      f"({rate:.1f} trials/min)")
+    return load_results(results_path)
+
+
+# Best trials run under `settings`; F-beta scores for different betas (or
+# folds, splits, datasets) are not comparable
+def print_best(results, settings, top=5):
+    results = [r for r in results if r.get("settings") == settings]
+    results = sorted(results, key=lambda r: r["fbeta"], reverse=True)[:top]
+    print(f"{'fbeta':>7} {'prec':>7} {'recall':>7} {'thresh':>7} {'auc':>7} {'rounds':>7}  params")
+    for r in results:
+        print(f"{r['fbeta']:>7.4f} {r['precision']:>7.4f} {r['recall']:>7.4f} {r['threshold']:>7.3f} "
+              f"{r['roc_auc']:>7.4f} {r['n_estimators']:>7}  {json.dumps(r['params'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validated XGBoost parameter and threshold search.")
+    parser.add_argument("--trials", type=int, default=20, help="parameter sets to sample")
+    parser.add_argument("--folds", type=int, default=5, help="stratified folds per trial")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--beta", type=float, default=1.0,
+                        help="F-beta used to pick the threshold (beta > 1 favours recall)")
+    parser.add_argument("--test-size", type=float, default=0.2, help="hold-out share excluded from the search")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--results", default=RESULTS_PATH, help="JSON-lines results store")
+    args = parser.parse_args(argv)
+
+    results = search(args.trials, args.folds, args.seed, args.beta, args.workers, args.results, args.test_size)
+    print_best(results, search_settings(args.folds, args.seed, args.beta, args.test_size))
+
+
+if __name__ == "__main__":
+    main()
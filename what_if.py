@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from features import FEATURE_COLUMNS
+from inference import NUMERIC_RANGES, encode_one
+from model_registry import get_registry
+from prediction_cache import feature_key
+
+# Features the what-if panel can vary: (distance either side of the
+# user's value, step)
+SWEEP_RANGES = {
+    "bmi": (10.0, 0.1),
+    "HbA1c_level": (2.0, 0.1),
+    "blood_glucose_level": (60.0, 5.0),
+}
+# Decimal places the prediction form accepts per feature (integer age and
+# glucose, one-decimal BMI and HbA1c); grid values are rounded to match
+FEATURE_DECIMALS = (0, 0, 0, 0, 0, 1, 1, 0)
+# Distinct sweeps kept per process (a 201 x 41 grid is ~66 KB)
+CACHE_SIZE = 256
+
+
+# Values of `column` around `center`, rounded to the precision the form
+# accepts and clipped to the valid range of the feature
+def feature_grid(column, center):
+    radius, step = SWEEP_RANGES[column]
+    decimals = FEATURE_DECIMALS[FEATURE_COLUMNS.index(column)]
+    steps = int(round(radius / step))
+    values = np.round(center + np.arange(-steps, steps + 1) * step, decimals)
+    low, high = NUMERIC_RANGES[column]
+    return values[(values > low) & (values <= high)]
+
+
+# Risk over a grid: row copies with `x_column` (and optionally `y_column`)
+# replaced by every grid value, scored in one predict_proba call. Returns
+# probabilities shaped (len(y_values), len(x_values)), or (len(x_values),).
+def sweep(bundle, row, x_column, x_values, y_column=None, y_values=None):
+    x_index = FEATURE_COLUMNS.index(x_column)
+    if y_column is None:
+        grid = np.tile(np.asarray(row, dtype=np.float64), (len(x_values), 1))
+        grid[:, x_index] = x_values
+        return bundle.predict_proba(grid)
+
+    y_index = FEATURE_COLUMNS.index(y_column)
+    grid = np.tile(np.asarray(row, dtype=np.float64), (len(y_values) * len(x_values), 1))
+    grid[:, x_index] = np.tile(x_values, len(y_values))
+    grid[:, y_index] = np.repeat(y_values, len(x_values))
+    return bundle.predict_proba(grid).reshape(len(y_values), len(x_values))
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# (x_values, y_values, probabilities) of the what-if sweep for one record,
+# cached per encoded input vector and model version (LRU of CACHE_SIZE
+# sweeps). y_column=None gives a single risk curve over x_column.
+def what_if(record, x_column, y_column=None, registry=None):
+    row = feature_key(encode_one(record))
+    bundle = (registry or get_registry()).get()
+    key = (row, bundle.version, x_column, y_column)
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            return result
+
+    x_values = feature_grid(x_column, row[FEATURE_COLUMNS.index(x_column)])
+    y_values = feature_grid(y_column, row[FEATURE_COLUMNS.index(y_column)]) if y_column else None
+    # Grid scoring is timed apart from the per-request "scale"/"predict" stages
+    probabilities = sweep(bundle.with_stage_prefix("what_if_"), row, x_column, x_values, y_column, y_values)
+    probabilities.flags.writeable = False
+    result = (x_values, y_values, probabilities)
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result